@@ -2,14 +2,28 @@ import os
 import requests
 import pandas as pd
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, UpdateMany, DeleteMany, ASCENDING, ReturnDocument
 from flask import Flask, render_template, request, redirect, url_for, jsonify, session
 from flask_session import Session
 from datetime import datetime,timedelta
 import json
-
-from threading import Thread
-from time import sleep
+import hashlib
+import hmac
+import copy
+import uuid
+import re
+from collections import OrderedDict, deque
+from queue import Queue
+from itertools import islice
+
+from threading import Thread, Lock, BoundedSemaphore
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import sleep, time
+from urllib.parse import urlparse, urlunparse, quote, parse_qsl, urlencode
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from pymongo.errors import PyMongoError, OperationFailure, DuplicateKeyError
+import click
 import logging
 
 # Load environment variable
@@ -25,6 +39,257 @@ def set_headers(TOKEN):
         "X-GitHub-Api-Version": "2022-11-28"
     }
 
+# Set Session BASE_URL and HEADERS for Public / Enterprise
+def set_github_host(enterprise):
+    if enterprise:
+        session['enterprise'] = True
+        session['BASE_URL'] = "https://api.github.ibm.com"
+        session['HEADERS'] = set_headers(os.getenv('GITHUB_ENTERPRISE'))
+    else:
+        session['enterprise'] = False
+        session['BASE_URL'] = "https://api.github.com"
+        session['HEADERS'] = set_headers(os.getenv('GITHUB_TOKEN'))
+
+# GitHub HTTP Client -------------->
+# One pooled keep-alive session per API host (public / enterprise), shared by every fetcher
+
+GITHUB_TIMEOUT = (float(os.getenv('GITHUB_CONNECT_TIMEOUT', 5)), float(os.getenv('GITHUB_READ_TIMEOUT', 30)))
+GITHUB_MAX_RETRIES = int(os.getenv('GITHUB_MAX_RETRIES', 4))
+GITHUB_BACKOFF = float(os.getenv('GITHUB_BACKOFF', 1))
+GITHUB_POOL_SIZE = int(os.getenv('GITHUB_POOL_SIZE', 20))
+
+# In-flight requests per host (public / enterprise), however many worker pools are nested above them
+GITHUB_WORKERS = {
+    False: int(os.getenv('GITHUB_WORKERS', 8)),
+    True: int(os.getenv('GITHUB_ENTERPRISE_WORKERS', 8)),
+}
+
+http_sessions = {}
+http_slots = {}             # host -> BoundedSemaphore, never more than the connection pool holds
+http_sessions_lock = Lock()
+
+def get_http_session(url):
+
+    host = urlparse(url).netloc
+
+    with http_sessions_lock:
+        if host not in http_sessions:
+            http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=GITHUB_POOL_SIZE)
+            http.mount('https://', adapter)
+            http.mount('http://', adapter)
+            http_sessions[host] = http
+
+            workers = GITHUB_WORKERS[host == "api.github.ibm.com"] if host in TOKEN_POOLS else GITHUB_POOL_SIZE
+            http_slots[host] = BoundedSemaphore(min(workers, GITHUB_POOL_SIZE))
+
+        return http_sessions[host], http_slots[host]
+
+def is_retryable(response):
+
+    # Secondary rate limits are handled by pausing the host (pause_host), not here
+    return response.status_code >= 500 or response.status_code == 429
+
+def get_retry_delay(response, attempt):
+
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return int(retry_after)
+
+    return GITHUB_BACKOFF * (2 ** attempt)
+
+# Rate Limit Scheduler -------------->
+# Token pool per host; each request takes the token with the most budget left, waits for a reset when all are spent
+
+def load_token_pool(single_var, pool_var):
+    tokens = [os.getenv(single_var)] + os.getenv(pool_var, '').split(',')
+    return list(dict.fromkeys(token.strip() for token in tokens if token and token.strip()))
+
+TOKEN_POOLS = {
+    "api.github.com": load_token_pool('GITHUB_TOKEN', 'GITHUB_TOKENS'),
+    "api.github.ibm.com": load_token_pool('GITHUB_ENTERPRISE', 'GITHUB_ENTERPRISE_TOKENS'),
+}
+RATE_LIMIT_RESERVE = int(os.getenv('GITHUB_RATE_LIMIT_RESERVE', 10))   # Keep a few calls spare per token
+GITHUB_MIN_INTERVAL = float(os.getenv('GITHUB_MIN_INTERVAL', 0))        # Seconds between requests per host (secondary limits)
+GITHUB_SECONDARY_WAIT = int(os.getenv('GITHUB_SECONDARY_WAIT', 60))     # Host pause after a secondary limit without Retry-After
+
+rate_limits = {}            # (token, resource) -> {'remaining', 'reset'}
+last_request_at = {}        # host -> time of the last request
+host_paused_until = {}      # host -> time a secondary rate limit pause ends
+rate_limit_lock = Lock()
+
+def get_rate_limit_resource(url):
+
+    path = urlparse(url).path
+    if path.endswith('/graphql'):
+        return 'graphql'
+    if '/search/' in path:
+        return 'search'
+    return 'core'
+
+def get_request_token(headers):
+    return headers.get('Authorization', '').removeprefix('Bearer ')
+
+def acquire_token(url, headers):
+
+    host = urlparse(url).netloc
+    pool = TOKEN_POOLS.get(host, [])
+    resource = get_rate_limit_resource(url)
+
+    # Host paused after a secondary rate limit -- every worker waits it out
+    paused = host_paused_until.get(host, 0) - time()
+    if paused > 0:
+        sleep(paused)
+
+    # Only swap tokens that belong to the host pool
+    if get_request_token(headers) not in pool:
+        return headers
+
+    while True:
+        with rate_limit_lock:
+            now = time()
+            best_token, best_remaining, next_reset = None, -1, None
+
+            for token in pool:
+                state = rate_limits.get((token, resource))
+
+                if state is None or state['reset'] <= now:
+                    remaining = float('inf')
+                else:
+                    remaining = state['remaining']
+                    next_reset = state['reset'] if next_reset is None else min(next_reset, state['reset'])
+
+                if remaining > best_remaining:
+                    best_token, best_remaining = token, remaining
+
+            if best_remaining > RATE_LIMIT_RESERVE:
+                state = rate_limits.get((best_token, resource))
+                if state and state['reset'] > now:
+                    state['remaining'] -= 1     # Spread concurrent workers until the response updates it
+
+                # Pace requests per host
+                wait = last_request_at.get(host, 0) + GITHUB_MIN_INTERVAL - now
+                last_request_at[host] = max(now, now + wait)
+                break
+
+            wait_for_reset = next_reset - now + 1
+
+        print(f"Rate limit reached on {host} ({resource}) for all {len(pool)} tokens -- pausing {int(wait_for_reset)}s")
+        sleep(wait_for_reset)
+
+    if wait > 0:
+        sleep(wait)
+
+    return {**headers, 'Authorization': f"Bearer {best_token}"}
+
+def record_rate_limit(headers, response):
+
+    remaining = response.headers.get('X-RateLimit-Remaining')
+    reset = response.headers.get('X-RateLimit-Reset')
+
+    if remaining is None or reset is None:
+        return
+
+    resource = response.headers.get('X-RateLimit-Resource', get_rate_limit_resource(response.url or ''))
+
+    with rate_limit_lock:
+        rate_limits[(get_request_token(headers), resource)] = {'remaining': int(remaining), 'reset': int(reset)}
+
+def is_rate_limited(response):
+    return response.status_code in (403, 429) and response.headers.get('X-RateLimit-Remaining') == '0' and 'X-RateLimit-Reset' in response.headers
+
+def is_secondary_limited(response):
+
+    # 403 / 429 with Retry-After or the abuse message, while the primary budget is not spent
+    if response.status_code not in (403, 429) or is_rate_limited(response):
+        return False
+
+    return 'Retry-After' in response.headers or 'secondary rate limit' in response.text.lower()
+
+def pause_host(url, response):
+
+    # GitHub asks for at least a minute when it sends no Retry-After
+    retry_after = response.headers.get('Retry-After')
+    delay = int(retry_after) if retry_after and retry_after.isdigit() else GITHUB_SECONDARY_WAIT
+
+    with rate_limit_lock:
+        host = urlparse(url).netloc
+        host_paused_until[host] = max(host_paused_until.get(host, 0), time() + delay)
+
+    return delay
+
+def github_request(method, url, **kwargs):
+
+    kwargs.setdefault('timeout', GITHUB_TIMEOUT)
+    headers = kwargs.pop('headers', None) or {}
+    http, slots = get_http_session(url)
+    attempt = 0
+
+    while True:
+        request_headers = acquire_token(url, headers)
+
+        try:
+            # Slot held for the request only -- retry / rate limit waits happen outside it
+            with slots:
+                response = http.request(method, url, headers=request_headers, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == GITHUB_MAX_RETRIES:
+                raise
+            delay = get_retry_delay(None, attempt)
+            print(f"Retrying {url} in {delay}s -- {e}")
+            sleep(delay)
+            attempt += 1
+            continue
+
+        record_rate_limit(request_headers, response)
+
+        # Primary limit spent -- acquire_token moves to another token or pauses until the reset
+        if is_rate_limited(response) and get_request_token(request_headers) in TOKEN_POOLS.get(urlparse(url).netloc, []):
+            print(f"Rate limit exhausted for a token on {urlparse(url).netloc} -- rescheduling {url}")
+            continue
+
+        # Secondary limit -- the whole host pauses, like primary exhaustion, without using the retry budget
+        if is_secondary_limited(response):
+            delay = pause_host(url, response)
+            print(f"Secondary rate limit on {urlparse(url).netloc} -- pausing {delay}s, rescheduling {url}")
+            continue
+
+        if attempt == GITHUB_MAX_RETRIES or not is_retryable(response):
+            return response
+
+        delay = get_retry_delay(response, attempt)
+        print(f"Retrying {url} in {delay}s -- {response.status_code}")
+        sleep(delay)
+        attempt += 1
+
+def github_get(url, headers):
+
+    # Conditional request -- 304 Not Modified does not count against the rate limit
+    cache_key = get_cache_key(url, headers)
+    cached = get_cached_response(cache_key)
+
+    if cached:
+        headers = dict(headers)
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        elif cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    response = github_request('GET', url, headers=headers)
+
+    if response.status_code == 304 and cached:
+        touch_cached_response(cache_key)
+        return build_cached_response(url, cached)
+
+    if response.status_code == 200:
+        store_cached_response(cache_key, url, response)
+
+    return response
+
+def github_post(url, json, headers):
+    return github_request('POST', url, json=json, headers=headers)
+
+
 github_events = {
     "IssuesEvent",
     "PullRequestEvent",
@@ -42,6 +307,185 @@ user_collection = None # will be set dynamically through routes
 data_collection = None
 
 
+# Conditional Request Cache -------------->
+# ETag / Last-Modified + body per (url, token), size-bounded by entry count
+
+GITHUB_CACHE_ENABLED = os.getenv('GITHUB_CACHE', 'on') != 'off'
+GITHUB_CACHE_MAX_ENTRIES = int(os.getenv('GITHUB_CACHE_MAX_ENTRIES', 50000))
+GITHUB_CACHE_MAX_BODY = int(os.getenv('GITHUB_CACHE_MAX_BODY', 4 * 1024 * 1024))    # Stay well below the 16 MB BSON cap
+GITHUB_CACHE_EVICT_EVERY = 500                                                      # Check the bound every N writes
+CACHED_HEADERS = ('Content-Type', 'Link', 'ETag', 'Last-Modified', 'X-Poll-Interval')
+
+cache_collection = db['IBM_http_cache']
+cache_state = {'indexed': False, 'writes': 0}
+
+def get_cache_key(url, headers):
+
+    # Token identity -- never store the raw token
+    token = hashlib.sha256(headers.get('Authorization', '').encode()).hexdigest()[:16]
+
+    return hashlib.sha256(f"{token} {url}".encode()).hexdigest()
+
+def get_cached_response(cache_key):
+
+    if not GITHUB_CACHE_ENABLED:
+        return None
+
+    try:
+        return cache_collection.find_one({'_id': cache_key})
+    except PyMongoError as e:
+        print(f"Cache lookup failed: {e}")
+        return None
+
+def touch_cached_response(cache_key):
+
+    try:
+        cache_collection.update_one({'_id': cache_key}, {'$set': {'last_used': datetime.utcnow()}})
+    except PyMongoError as e:
+        print(f"Cache update failed: {e}")
+
+def build_cached_response(url, cached):
+
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = cached['body']
+    response.headers = CaseInsensitiveDict(cached.get('headers', {}))
+    response.encoding = 'utf-8'
+    response.from_cache = True
+
+    return response
+
+def store_cached_response(cache_key, url, response):
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+
+    if not GITHUB_CACHE_ENABLED or not (etag or last_modified) or len(response.content) > GITHUB_CACHE_MAX_BODY:
+        return
+
+    try:
+        if not cache_state['indexed']:
+            cache_collection.create_index('last_used')
+            cache_state['indexed'] = True
+
+        cache_collection.replace_one(
+            {'_id': cache_key},
+            {
+                'url': url,
+                'etag': etag,
+                'last_modified': last_modified,
+                'body': response.content,
+                'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+                'size': len(response.content),
+                'last_used': datetime.utcnow()
+            },
+            upsert=True
+        )
+
+        cache_state['writes'] += 1
+        if cache_state['writes'] % GITHUB_CACHE_EVICT_EVERY == 0:
+            evict_cached_responses()
+
+    except PyMongoError as e:
+        print(f"Cache store failed: {e}")
+
+def evict_cached_responses():
+
+    # Drop least recently used entries beyond the bound
+    excess = cache_collection.estimated_document_count() - GITHUB_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return
+
+    stale = cache_collection.find({}, {'_id': 1}).sort('last_used', 1).limit(excess)
+    cache_collection.delete_many({'_id': {'$in': [doc['_id'] for doc in stale]}})
+
+
+
+# In-process LRU -------------->
+
+class LRUCache:
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+
+# Commit Detail Cache -------------->
+# Commit details never change for a SHA -- shared by every user, PR and repo update
+
+commit_cache_collection = db['IBM_commit_cache']
+commit_lru = LRUCache(int(os.getenv('COMMIT_CACHE_SIZE', 5000)))
+
+def get_commit_cache_key(repo_full_name, sha):
+    return f"{urlparse(session['BASE_URL']).netloc}/{repo_full_name}/{sha}"
+
+def get_cached_commit(cache_key):
+
+    details = commit_lru.get(cache_key)
+    if details:
+        return details
+
+    try:
+        result = commit_cache_collection.find_one({'_id': cache_key})
+    except PyMongoError as e:
+        print(f"Commit cache lookup failed: {e}")
+        return None
+
+    if result:
+        commit_lru.put(cache_key, result['details'])
+        return result['details']
+
+    return None
+
+def load_cached_commits(repo_full_name, shas):
+
+    # Warm the LRU with one query for a whole batch of SHAs
+    keys = [get_commit_cache_key(repo_full_name, sha) for sha in shas]
+    missing = [key for key in keys if commit_lru.get(key) is None]
+
+    if not missing:
+        return
+
+    try:
+        for result in commit_cache_collection.find({'_id': {'$in': missing}}):
+            commit_lru.put(result['_id'], result['details'])
+    except PyMongoError as e:
+        print(f"Commit cache lookup failed: {e}")
+
+def store_cached_commit(cache_key, repo_full_name, details):
+
+    commit_lru.put(cache_key, details)
+
+    try:
+        commit_cache_collection.replace_one(
+            {'_id': cache_key},
+            {
+                'host': urlparse(session['BASE_URL']).netloc,
+                'repo': repo_full_name,
+                'sha': details['sha'],
+                'details': details
+            },
+            upsert=True
+        )
+    except PyMongoError as e:
+        print(f"Commit cache store failed: {e}")
+
 # FLASK APP ---------------------
 app = Flask(__name__)
 SESSION_TYPE = 'filesystem'
@@ -59,26 +503,209 @@ def get_start_date():
 
     return one_year_back
 
-# USER BASE FUNCTIONS ------------------------------->
+# PARALLEL FETCH HELPERS ------------>
+# Bounded worker pool per host; workers carry a copy of the caller's session (BASE_URL / HEADERS)
 
-def get_login_name(username):
+SESSION_HOST_KEYS = ('enterprise', 'BASE_URL', 'HEADERS')
 
-    url = f"{session['BASE_URL']}/search/users?q={username}"
-    response = requests.get(url, headers = session['HEADERS'])  
+def get_session_host():
+    return {key: session[key] for key in SESSION_HOST_KEYS if key in session}
 
-    if response.status_code == 200:
-        search_results = response.json()
-        if search_results['total_count'] > 0:
-            return search_results['items'][0]['login']
-        else:
-            return None
-    else:
-        print(f"Error fetching user by email: {response.status_code} {response.text}")
-        return None  # Handle error response appropriately
+def push_session_context(values):
+    ctx = app.test_request_context()
+    ctx.push()
+    session.update(values)
+
+def run_parallel(func, items):
+
+    # Results keep input order; a failing item yields None without affecting the rest
+    items = list(items)
+    if not items:
+        return []
+
+    values = get_session_host()
+    workers = min(GITHUB_WORKERS[bool(values.get('enterprise'))], len(items))
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, initializer=push_session_context, initargs=(values,)) as pool:
+        futures = [pool.submit(func, item) for item in items]
+
+        for item, future in zip(items, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Parallel fetch failed for {item}: {e}")
+                results.append(None)
+
+    return results
+
+# PAGINATION ------------>
+# Follows Link rel="next" / rel="last"; once the last page is known the rest are prefetched in parallel
+
+GITHUB_PAGE_PREFETCH = int(os.getenv('GITHUB_PAGE_PREFETCH', 4))
+
+def set_query_params(url, **params):
+    parsed = urlparse(url)
+    query = dict(parse_qsl(parsed.query, keep_blank_values=True))
+    query.update({key: str(value) for key, value in params.items()})
+    return urlunparse(parsed._replace(query=urlencode(query, quote_via=quote, safe=':,')))
+
+def parse_link_header(response):
+    links = {}
+    for part in response.headers.get('Link', '').split(','):
+        match = re.match(r'\s*<([^>]+)>;\s*rel="(\w+)"', part)
+        if match:
+            links[match.group(2)] = match.group(1)
+    return links
+
+def get_page(url, strict=False):
+    response = github_get(url, headers=session['HEADERS'])
+
+    if response.status_code != 200:
+        print(f"Error fetching data from {url}: {response.status_code} {response.text}")
+
+        # Checkpointed scans must not mistake a failed page for the end of the listing
+        if strict:
+            raise requests.HTTPError(f"{response.status_code} fetching {url}", response=response)
+        return None
+
+    return response
+
+def get_page_data(url, strict=False):
+    response = get_page(url, strict)
+    return response.json() if response is not None else None
+
+def prefetch_pages(url, last_page, prefetch, first_page=2, strict=False):
+
+    pool = ThreadPoolExecutor(max_workers=prefetch, initializer=push_session_context, initargs=(get_session_host(),))
+    pages = iter(range(first_page, last_page + 1))
+    pending = deque(pool.submit(get_page_data, set_query_params(url, page=page), strict) for page in islice(pages, prefetch))
+
+    try:
+        while pending:
+            data = pending.popleft().result()
+
+            # Keep the window full as pages are consumed
+            next_page = next(pages, None)
+            if next_page is not None:
+                pending.append(pool.submit(get_page_data, set_query_params(url, page=next_page), strict))
+
+            if not data:
+                break
+
+            yield data
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def paginate_pages(url, per_page=100, prefetch=GITHUB_PAGE_PREFETCH, start_page=1, strict=False):
+    """Yield each page (list of items) of a paginated GitHub listing, from start_page on.
+
+    With strict, a failed page raises requests.HTTPError instead of ending the listing.
+    """
+
+    url = set_query_params(url, per_page=per_page)
+    response = get_page(set_query_params(url, page=start_page), strict)
+
+    if response is None:
+        return
+
+    yield response.json()
+    links = parse_link_header(response)
+
+    # Last page known -- fetch the rest concurrently
+    if 'last' in links and prefetch > 1:
+        last_page = int(dict(parse_qsl(urlparse(links['last']).query)).get('page', 1))
+        yield from prefetch_pages(url, last_page, prefetch, start_page + 1, strict)
+        return
+
+    while 'next' in links:
+        response = get_page(links['next'], strict)
+        if response is None:
+            return
+
+        yield response.json()
+        links = parse_link_header(response)
+
+def paginate(url, per_page=100, prefetch=GITHUB_PAGE_PREFETCH, strict=False):
+    """Yield items of a paginated GitHub listing lazily, so callers can stop early."""
+    for page_data in paginate_pages(url, per_page, prefetch, strict=strict):
+        yield from page_data
+
+def iter_search_items(query, per_page=100, strict=False):
+
+    # Search API -- pages are {'total_count', 'items'}, capped at 1000 results per query
+    url = f"{session['BASE_URL']}/search/issues?q={quote(query)}"
+
+    for page_number, page_data in enumerate(paginate_pages(url, per_page, strict=strict), 1):
+        if page_number == 1 and page_data.get('total_count', 0) > 1000:
+            print(f"Search capped at 1000 of {page_data['total_count']} -- use smaller shards: {query}")
+
+        yield from page_data.get('items', [])
+
+
+# WINDOW SHARDS ------------>
+# The extraction window split into date ranges that are fetched concurrently
+
+EXTRACTION_SHARD_DAYS = int(os.getenv('EXTRACTION_SHARD_DAYS', 0))      # 0 keeps one sequential scan
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', 4))
+
+def get_window_shards(start_date, end_date=None, days=None):
+
+    # [(since, until)] newest first; until is inclusive, one second before the next shard starts
+    days = days or EXTRACTION_SHARD_DAYS
+    end_date = end_date or datetime.utcnow()
+    shards = []
+
+    until = end_date
+    while until > start_date:
+        since = max(until - timedelta(days=days), start_date)
+        shards.append((since, until))
+        until = since - timedelta(seconds=1)
+
+    return shards
+
+def format_shard_date(date):
+    return date.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def get_shard_key(shard):
+    return format_shard_date(shard[0])
+
+def iter_sharded(shards, scan_shard, progress=None):
+
+    # scan_shard(since, until) runs for every pending shard concurrently; records are yielded per finished shard
+    progress = {} if progress is None else progress     # shard key -> True
+    pending = [shard for shard in shards if progress.get(get_shard_key(shard)) is not True]
+
+    if not pending:
+        return
+
+    values = get_session_host()
+    with ThreadPoolExecutor(max_workers=min(SHARD_WORKERS, len(pending)), initializer=push_session_context, initargs=(values,)) as pool:
+        futures = {pool.submit(scan_shard, *shard): shard for shard in pending}
+
+        for future in as_completed(futures):
+            yield from future.result()
+            progress[get_shard_key(futures[future])] = True
+
+def iter_unique(records, get_key):
+
+    # Shards can meet at their edges -- keep the first record per key
+    seen = set()
+    for record in records:
+        if get_key(record) not in seen:
+            seen.add(get_key(record))
+            yield record
+
+def get_commit_details_batch(repo_full_name, shas):
+    load_cached_commits(repo_full_name, shas)
+    return run_parallel(lambda sha: get_commit_details_from_SHA(repo_full_name, sha), shas)
+
+
+# USER BASE FUNCTIONS ------------------------------->
 
 def get_user_info(username):
     url = f"{session['BASE_URL']}/users/{username}"
-    response = requests.get(url, headers=session['HEADERS'])
+    response = github_get(url, headers=session['HEADERS'])
 
     if response.status_code == 200:
         return response.json()
@@ -86,6 +713,129 @@ def get_user_info(username):
         print(f"Error fetching user info: {response.status_code} {response.text}")
         return {}
 
+
+# Identity Cache -------------->
+# Username / email -> canonical login and profile, so dashboard requests stay off the 30 req/min search API
+
+IDENTITY_TTL = int(os.getenv('IDENTITY_TTL', 86400))                      # profile is fresh for this long
+IDENTITY_NEGATIVE_TTL = int(os.getenv('IDENTITY_NEGATIVE_TTL', 600))      # unknown users are remembered for this long
+IDENTITY_MAX_AGE = int(os.getenv('IDENTITY_MAX_AGE', 7 * 86400))          # stale profiles are still served (and refreshed) until this age
+
+identity_collection = db['IBM_identity_cache']
+identity_lru = LRUCache(int(os.getenv('IDENTITY_CACHE_SIZE', 2000)))
+identity_refreshing = set()
+identity_lock = Lock()
+
+def get_identity_key(user):
+    return f"{get_host()}/{user.strip().lower()}"
+
+def fetch_identity(user):
+
+    # (profile, found) -- found is None when GitHub could not answer, so failures are never negative-cached
+    # A mapped dashboard login resolves to the user's login on this host without a search
+    field = 'enterprise' if session.get('enterprise') else 'public'
+    mapping = db['IBM_user_mappings'].find_one({'login': user}, {field: 1})
+    login = mapping.get(field) if mapping and mapping.get(field) else user
+
+    # Plain logins resolve directly; only emails and unknown names need the search API
+    if '@' not in login:
+        response = github_get(f"{session['BASE_URL']}/users/{quote(login)}", headers=session['HEADERS'])
+
+        if response.status_code == 200:
+            return response.json(), True
+        if response.status_code != 404:
+            print(f"Error fetching user info: {response.status_code} {response.text}")
+            return {}, None
+
+    response = github_get(f"{session['BASE_URL']}/search/users?q={quote(user)}", headers=session['HEADERS'])
+
+    if response.status_code != 200:
+        print(f"Error fetching user by email: {response.status_code} {response.text}")
+        return {}, None
+
+    items = response.json().get('items')
+    if not items:
+        return None, False
+
+    profile = get_user_info(items[0]['login'])
+    return profile, (True if profile else None)
+
+def store_identity(key, user, profile):
+
+    entry = {
+        'host': get_host(),
+        'query': user,
+        'login': profile['login'] if profile else None,
+        'profile': profile,
+        'fetched_at': datetime.today()
+    }
+    identity_lru.put(key, entry)
+
+    try:
+        identity_collection.replace_one({'_id': key}, entry, upsert=True)
+    except PyMongoError as e:
+        print(f"Identity cache store failed: {e}")
+
+def load_identity(key):
+
+    entry = identity_lru.get(key)
+    if entry:
+        return entry
+
+    try:
+        entry = identity_collection.find_one({'_id': key})
+    except PyMongoError as e:
+        print(f"Identity cache lookup failed: {e}")
+        return None
+
+    if entry:
+        identity_lru.put(key, entry)
+    return entry
+
+def refresh_identity(key, user, values):
+
+    push_session_context(values)
+
+    try:
+        profile, found = fetch_identity(user)
+        if found is not None:
+            store_identity(key, user, profile)
+    except Exception as e:
+        print(f"Identity refresh failed for {user}: {e}")
+    finally:
+        with identity_lock:
+            identity_refreshing.discard(key)
+
+def resolve_identity(user):
+
+    # Profile dict, None for a user GitHub does not know, {} when the lookup failed
+    key = get_identity_key(user)
+    entry = load_identity(key)
+
+    if entry:
+        age = (datetime.today() - entry['fetched_at']).total_seconds()
+        ttl = IDENTITY_TTL if entry['profile'] else IDENTITY_NEGATIVE_TTL
+
+        if age < ttl:
+            return entry['profile']
+
+        # Serve the stale profile and refresh it in the background
+        if entry['profile'] and age < IDENTITY_MAX_AGE:
+            with identity_lock:
+                refreshing = key in identity_refreshing
+                identity_refreshing.add(key)
+
+            if not refreshing:
+                Thread(target=refresh_identity, args=(key, user, get_session_host()), daemon=True).start()
+            return entry['profile']
+
+    profile, found = fetch_identity(user)
+    if found is None:
+        return entry['profile'] if entry and entry['profile'] else {}
+
+    store_identity(key, user, profile)
+    return profile
+
 def get_user_contributions(username, enterprise):
 
     if enterprise:
@@ -120,7 +870,7 @@ def get_user_contributions(username, enterprise):
     }
 
     # Make the request
-    response = requests.post(f"{BASE_URL}/graphql", json=payload, headers=HEADERS)
+    response = github_post(f"{BASE_URL}/graphql", json=payload, headers=HEADERS)
 
     if response.status_code == 404:
         return None
@@ -162,7 +912,7 @@ def get_user_contributions(username, enterprise):
 
 def get_user_repositories(username):
     url = f"{session['BASE_URL']}/users/{username}/repos"
-    response = requests.get(url, headers=session['HEADERS'])
+    response = github_get(url, headers=session['HEADERS'])
 
     if response.status_code == 200:
         return response.json()
@@ -172,7 +922,7 @@ def get_user_repositories(username):
 
 def get_repo_topics(repo_full_name):
     url = f"{session['BASE_URL']}/repos/{repo_full_name}/topics"
-    response = requests.get(url, headers=session['HEADERS'])
+    response = github_get(url, headers=session['HEADERS'])
     
     if response.status_code == 200:
         return response.json().get('names', [])
@@ -182,8 +932,14 @@ def get_repo_topics(repo_full_name):
 
 def get_commit_details_from_SHA(repo_full_name, sha):
 
+    # Callers annotate the result (branch, merged) -- always hand out a copy
+    cache_key = get_commit_cache_key(repo_full_name, sha)
+    cached = get_cached_commit(cache_key)
+    if cached:
+        return copy.deepcopy(cached)
+
     url = f"{session['BASE_URL']}/repos/{repo_full_name}/commits/{sha}"
-    response = requests.get(url, headers=session['HEADERS'])
+    response = github_get(url, headers=session['HEADERS'])
 
     if response.status_code == 200:
         commit_data = response.json()
@@ -193,7 +949,7 @@ def get_commit_details_from_SHA(repo_full_name, sha):
         else:
             merged = False
 
-        return {
+        details = {
             "sha": commit_data["sha"],
             "message": commit_data["commit"]["message"],
             "date": commit_data["commit"]["committer"]["date"],
@@ -204,297 +960,510 @@ def get_commit_details_from_SHA(repo_full_name, sha):
             "files": [{"filename": file['filename'], "additions": file['additions'], "deletions": file['deletions']}
                         for file in commit_data['files']]
         }
+
+        store_cached_commit(cache_key, repo_full_name, details)
+
+        return copy.deepcopy(details)
     else:
         print(f"Error fetching commit details for {sha}: {response.status_code} {response.text}")
         return None
 
-def get_user_global_commits(repo_full_name, username, start_date):
+def is_branch_covered(repo_full_name, default_branch, branch_name):
+
+    # Branch has nothing that isn't already on the default branch
+    url = f"{session['BASE_URL']}/repos/{repo_full_name}/compare/{quote(default_branch, safe='')}...{quote(branch_name, safe='')}?per_page=1"
+    response = github_get(url, headers=session['HEADERS'])
+
+    if response.status_code == 200:
+        return response.json().get('status') in ('identical', 'behind')
+    else:
+        print(f"Error comparing {branch_name} with {default_branch}: {response.status_code} {response.text}")
+        return False
+
+def get_scan_branches(repo_full_name, default_branch=None):
 
-    #testing
-    # return []
+    # Branch names worth scanning -- default first, without duplicate heads or branches the default already contains
+    scanned_heads = set()
+    branch_names = []
 
-    commits_with_details = []
+    if default_branch is None:
+        response = github_get(f"{session['BASE_URL']}/repos/{repo_full_name}", headers=session['HEADERS'])
+        default_branch = response.json().get('default_branch') if response.status_code == 200 else None
     
     # Step 1: Get all branches
     branches_url = f"{session['BASE_URL']}/repos/{repo_full_name}/branches"
-    branches_response = requests.get(branches_url, headers=session['HEADERS'])
+    branches = list(paginate(branches_url))
 
-    if branches_response.status_code == 200:
-        branches = branches_response.json()
-        
-        for branch in branches:
-            branch_name = branch['name']
-            page = 1
-            
-            while True:
-                # Fetch commits authored by the specified user for each branch
-                url = f"{session['BASE_URL']}/repos/{repo_full_name}/commits?author={username}&sha={branch_name}&per_page=100&page={page}&since={start_date}"
-                response = requests.get(url, headers=session['HEADERS'])
-
-                if response.status_code == 200:
-                    branch_commits = response.json()
-                    if not branch_commits:  # No more commits
-                        break
+    # Scan the default branch first, so other branches can be checked against it
+    branches.sort(key=lambda branch: branch['name'] != default_branch)
+    
+    for branch in branches:
+        branch_name = branch['name']
+        head_sha = branch['commit']['sha']
+
+        # Skip branches whose head was already scanned or is contained in the default branch
+        if head_sha in scanned_heads:
+            print(f"Skipping {branch_name} -- same head as a scanned branch")
+            continue
 
-                    # Step 2: Get details for each commit directly
-                    for commit in branch_commits:
-                        sha = commit["sha"]
-                        print(branch_name," - ",sha)
+        if default_branch and branch_name != default_branch and is_branch_covered(repo_full_name, default_branch, branch_name):
+            print(f"Skipping {branch_name} -- covered by {default_branch}")
+            scanned_heads.add(head_sha)
+            continue
 
-                        detailed_commit = get_commit_details_from_SHA(repo_full_name, sha)
+        scanned_heads.add(head_sha)
+        branch_names.append(branch_name)
 
-                        if detailed_commit:
-                            detailed_commit['branch'] = branch_name
-                            detailed_commit['merged'] = False            # Only for Global Commits, set as non-merged
-                            commits_with_details.append(detailed_commit)
+    return branch_names
 
-                    page += 1  # Go to the next page
-                else:
-                    print(f"Error fetching commits for branch {branch_name}: {response.status_code} {response.text}")
-                    break
-    else:
-        print(f"Error fetching branches: {branches_response.status_code} {branches_response.text}")
+def iter_global_commits(repo_full_name, start_date, logins, default_branch=None, author=None, progress=None, commit_branches=None, until=None, branches=None):
+
+    # Yields (login, sha, branch, details) for the given logins, across all branches
+    # A commit is yielded with its details once; finding it on another branch yields it again with details None
+    # Resumable callers pass <progress> (branch -> pages done, or True) and <commit_branches> (sha -> branches) of stored commits
+    # With <progress>, a failed page or commit lookup raises and leaves the page count where it stopped
+    strict = progress is not None
+    commit_branches = {} if commit_branches is None else commit_branches
+    progress = {} if progress is None else progress
+
+    if branches is None:
+        branches = get_scan_branches(repo_full_name, default_branch)
+
+    for branch_name in branches:
+
+        # Finished before a restart
+        if progress.get(branch_name) is True:
+            continue
+
+        # Fetch commits for each branch -- authored by the specified user, if given
+        url = f"{session['BASE_URL']}/repos/{repo_full_name}/commits?sha={branch_name}&since={start_date}"
+        if until:
+            url += f"&until={until}"
+        if author:
+            url += f"&author={author}"
+
+        start_page = progress.get(branch_name, 0) + 1
+        
+        for page, branch_commits in enumerate(paginate_pages(url, start_page=start_page, strict=strict), start_page):
+
+            shas, commit_logins = [], []
+            for commit in branch_commits:
+                login = author or get_login(commit['author'])
+
+                if commit["sha"] in commit_branches:
+                    if branch_name not in commit_branches[commit["sha"]]:
+                        commit_branches[commit["sha"]].append(branch_name)
+                        yield login, commit["sha"], branch_name, None
+                elif login in logins:
+                    shas.append(commit["sha"])
+                    commit_logins.append(login)
+
+            # Step 2: Get details for the new commits of the page in parallel
+            print(branch_name," - ",len(shas), "new commits")
+
+            for login, sha, detailed_commit in zip(commit_logins, shas, get_commit_details_batch(repo_full_name, shas)):
+
+                if not detailed_commit and strict:
+                    raise requests.HTTPError(f"Commit details unavailable for {repo_full_name}@{sha}")
+
+                if detailed_commit:
+                    detailed_commit['branch'] = branch_name
+                    detailed_commit['branches'] = [branch_name]
+                    detailed_commit['merged'] = False            # Only for Global Commits, set as non-merged
+                    commit_branches[detailed_commit['sha']] = [branch_name]
+                    yield login, detailed_commit['sha'], branch_name, detailed_commit
+
+            progress[branch_name] = page
+
+        progress[branch_name] = True
+
+def scan_global_commits(repo_full_name, start_date, logins, default_branch=None):
+
+    # Returns {login: [commit details]} for the given logins, each commit with every branch that contains it
+    commits_by_login = {}
+    commits_by_sha = {}
+
+    for login, sha, branch_name, details in iter_global_commits(repo_full_name, start_date, logins, default_branch):
+        if details:
+            commits_by_login.setdefault(login, []).append(details)
+            commits_by_sha[sha] = details
+        else:
+            commits_by_sha[sha]['branches'].append(branch_name)
     
-    return commits_with_details
+    return commits_by_login
+
+def build_issue_data(issue, username):
+    return {
+        'url': issue['html_url'],
+        'title': issue['title'],
+        'number': issue['number'],
+        'created_at': issue['created_at'],
+        'updated_at': issue['updated_at'],
+        'labels': issue['labels'],
+        'state': issue['state'],
+        'type': 'created' if issue['user']['login'] == username else 'assigned'
+    }
 
-def get_user_issues(repo_full_name, username, start_date):
-    #testing
-    # return []
+def iter_user_issues(repo_full_name, username, start_date, progress=None):
 
-    issues_details = []
+    # Yields the user's issues as pages arrive; <progress> (role -> pages done, or True) lets a restart resume
+    seen = set()
+    strict = progress is not None
+    progress = {} if progress is None else progress
 
-    page = 1
-    while True:
-        url = f"{session['BASE_URL']}/repos/{repo_full_name}/issues?page={page}&per_page=100&state=all&since={start_date}"
-        response = requests.get(url, headers=session['HEADERS'])
+    # Filter on the server -- one scan for issues the user created, one for issues assigned to them
+    for role in ('creator', 'assignee'):
+        if progress.get(role) is True:
+            continue
 
-        if response.status_code == 200:
-            issues = response.json()
-            if not issues:  # No more issues
-                break
+        url = f"{session['BASE_URL']}/repos/{repo_full_name}/issues?{role}={username}&state=all&since={start_date}"
+        start_page = progress.get(role, 0) + 1
+
+        for page, issues in enumerate(paginate_pages(url, start_page=start_page, strict=strict), start_page):
 
             for issue in issues:
-                # Check if this is a pull request
-                if 'pull_request' in issue:
+                # Check if this is a pull request / already collected
+                if 'pull_request' in issue or issue['number'] in seen:
                     pass
-                elif (issue['user']['login'] == username) or any(assignee['login'] == username for assignee in issue['assignees']):
+                else:
                     print(f"Getting | Issue -> {issue['number']}")
-                    
-                    issue_data = {
-                        'url': issue['html_url'],
-                        'title': issue['title'],
-                        'number': issue['number'],
-                        'created_at': issue['created_at'],
-                        'updated_at': issue['updated_at'],
-                        'labels': issue['labels'],
-                        'state': issue['state'],
-                        'type': 'created' if issue['user']['login'] == username else 'assigned'
-                    }
-                    
-                    issues_details.append(issue_data)
+                    seen.add(issue['number'])
+                    yield build_issue_data(issue, username)
 
-            page += 1  # Go to the next page
-        else:
-            print(f"Error fetching issues: {response.status_code} {response.text}")
+            progress[role] = page
+
+        progress[role] = True
+
+def scan_repo_issues(repo_full_name, start_date, logins):
+
+    # One pass over the repo's issues, split into {login: [issues]} by creator / assignee
+    issues_by_login = {}
+    url = f"{session['BASE_URL']}/repos/{repo_full_name}/issues?state=all&since={start_date}"
+
+    for issue in paginate(url):
+        if 'pull_request' in issue:
+            continue
+
+        involved = {issue['user']['login']} | {assignee['login'] for assignee in issue['assignees']}
+
+        for login in involved & set(logins):
+            issues_by_login.setdefault(login, []).append(build_issue_data(issue, login))
+
+    return issues_by_login
+
+def scan_repo_prs(repo_full_name, start_date, logins):
+
+    # One pass over the PRs created in the window, newest first, split into {login: [PR entries]}
+    pulls = []
+    url = f"{session['BASE_URL']}/repos/{repo_full_name}/pulls?state=all&sort=created&direction=desc"
+
+    for pull_requests in paginate_pages(url, prefetch=1):
+        window_reached = False
+
+        for pr in pull_requests:
+            if datetime.strptime(pr['created_at'], "%Y-%m-%dT%H:%M:%SZ") < start_date:
+                window_reached = True
+                break
+
+            pulls.append(pr)
+
+        if window_reached:
             break
 
-    return issues_details
+    return split_prs_by_login(repo_full_name, pulls, logins, start_date)
+
+def split_prs_by_login(repo_full_name, pulls, logins, since):
+
+    # Author / assignees / requested reviewers come from the list payload, reviewers take one /reviews call per PR
+    base_url = f"{session['BASE_URL']}/repos/{repo_full_name}"
+
+    def get_pr_logins(pr):
+        involved = {pr['user']['login']} | {user['login'] for user in pr.get('assignees', [])} | {user['login'] for user in pr.get('requested_reviewers', [])}
+        involved |= {review['user']['login'] for review in paginate(f"{base_url}/pulls/{pr['number']}/reviews") if review['user']}
+        return involved & set(logins)
+
+    pairs = [(pr['number'], login) for pr, involved in zip(pulls, run_parallel(get_pr_logins, pulls)) for login in (involved or ())]
+    comment_index = build_comment_index(repo_full_name, since) if pairs and COMMENT_HARVESTER == 'bulk' else None
+
+    prs_by_login = {}
+    for (pr_number, login), pr_entry in zip(pairs, run_parallel(lambda pair: get_pr_entry(repo_full_name, *pair, comment_index), pairs)):
+        if pr_entry:
+            prs_by_login.setdefault(login, []).append(pr_entry)
+
+    return prs_by_login
 
 def get_issue_comments(issue_list, username):
     comments = []
 
     for issue in issue_list:
         repo_full_name = issue['repo_full_name']
-        page = 1
-        
-        while True:
-            url = f"{session['BASE_URL']}/repos/{repo_full_name}/issues/{issue['number']}/comments?page={page}&per_page=100"
-            response = requests.get(url, headers=session['HEADERS'])
+        url = f"{session['BASE_URL']}/repos/{repo_full_name}/issues/{issue['number']}/comments"
 
-            if response.status_code == 200:
-                issue_comments = response.json()
-                if not issue_comments:  # No more comments
-                    break
+        for comment in paginate(url):
+            if comment['user']['login'] == username:
+                comment_info = {
+                    'id': comment['id'],
+                    'body': comment['body'],
+                    'user': comment['user']['login'],
+                    'created_at': comment['created_at'],
+                    'updated_at': comment['updated_at'],
+                    'html_url': comment['html_url']
+                }
+                comments.append(comment_info)
+    
+    return comments
+
+# Bulk Comment Harvest -------------->
+# The repo-wide review comment stream pulled once per window, indexed by PR number and author,
+# instead of one comments call per review. Review states are not in the stream, so get_pr_comments
+# still makes one /reviews call per PR -- the saving covers review comments only
+
+COMMENT_HARVESTER = os.getenv('COMMENT_HARVESTER', 'bulk')     # 'bulk' | 'thread', for repo-level passes
+
+def get_thread_number(url):
+    return int(url.rstrip('/').rsplit('/', 1)[-1])
+
+def build_comment_index(repo_full_name, since):
+
+    # {pr_number: {login: [review comments]}}
+    comment_index = {}
+    since_param = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+    url = f"{session['BASE_URL']}/repos/{repo_full_name}/pulls/comments?since={since_param}"
+
+    for comment in paginate(url):
+        if not comment.get('user'):
+            continue
+
+        number = get_thread_number(comment['pull_request_url'])
+        comment_index.setdefault(number, {}).setdefault(comment['user']['login'], []).append(comment)
+
+    print(f"Indexed review comments --> {len(comment_index)} PRs")
+
+    return comment_index
+
+# -- GROUP
+def get_paginated_data(url, strict=False):
+    """Fetch paginated data from a given URL."""
+    return list(paginate(url, strict=strict))
+
+def get_commit_details_list(repo_full_name, shas, strict=False):
+
+    # Details for every sha; with <strict> a failed lookup raises instead of being dropped
+    details_list = get_commit_details_batch(repo_full_name, shas)
+
+    for sha, details in zip(shas, details_list):
+        if not details and strict:
+            raise requests.HTTPError(f"Commit details unavailable for {repo_full_name}@{sha}")
+
+    return [details for details in details_list if details]
+    
+def get_pr_commits(repo_full_name, pr_number, username, strict=False):
+
+    commits_url = f"{session['BASE_URL']}/repos/{repo_full_name}/pulls/{pr_number}/commits"
+    commits = get_paginated_data(commits_url, strict)
+    
+    # Filter commits by username
+    filtered = [commit['sha'] for commit in commits if commit['author'] and commit['author']['login'] == username]
+
+    detailed_commits = get_commit_details_list(repo_full_name, filtered, strict)
+    
+    return detailed_commits
+
+def get_pr_comments(repo_full_name, pr_number, username, comment_index=None, strict=False):
+
+    comments_data = []
+
+    review_url = f"{session['BASE_URL']}/repos/{repo_full_name}/pulls/{pr_number}/reviews"
+    reviews = get_paginated_data(review_url, strict)
+
+    for review in reviews:
+        if review['user']['login'] == username:
+            state = review['state']
+
+            if state == 'APPROVED':
+                data = {
+                    'state': "approved",
+                    'url': review['html_url'],
+                    'comment': review['body'] if review['body'] else None,
+                    'date': review['submitted_at'],
+                }
+                comments_data.append(data)
+
+            elif state in ('CHANGES_REQUESTED', 'COMMENTED'):
+                if comment_index is not None:
+                    user_comments = comment_index.get(pr_number, {}).get(username, [])
+                    comments = [comment for comment in user_comments if comment.get('pull_request_review_id') == review['id']]
+                else:
+                    comment_url = review_url + f"/{review['id']}/comments"
+                    comments = get_paginated_data(comment_url, strict)
 
-                for comment in issue_comments:
+                for comment in comments:
                     if comment['user']['login'] == username:
-                        comment_info = {
-                            'id': comment['id'],
-                            'body': comment['body'],
-                            'user': comment['user']['login'],
-                            'created_at': comment['created_at'],
-                            'updated_at': comment['updated_at'],
-                            'html_url': comment['html_url']
+
+                        data = {
+                            'state': state.lower(),
+                            'url': comment['html_url'],
+                            'comment': comment.get('body'),
+                            'date': comment['updated_at'],
+                            'file': comment.get('path')
                         }
-                        comments.append(comment_info)
+                        comments_data.append(data)
 
-                page += 1  # Go to the next page
-            else:
-                print(f"Couldn't fetch comments for issue {issue['number']}: {response.status_code} {response.text}")
-                break
-    
-    return comments
+    return comments_data
 
-# -- GROUP
-def get_pr_details_commits_comments(repo_full_name, username, start_date):
+def get_reviewed_prs(repo_full_name, username, since, strict=False):
 
-    base_url = f"{session['BASE_URL']}/repos/{repo_full_name}"
-    pull_details_list = []
-    page = 1
-    per_page = 100  # Adjust the number of results per page if necessary
+    # Numbers of the PRs created since <since> that the user reviewed -- one search for the whole window
+    # None when the search is past its 1000 result cap
+    query = f"repo:{repo_full_name} is:pr reviewed-by:{username} created:>={format_shard_date(since)}"
+    url = f"{session['BASE_URL']}/search/issues?q={quote(query)}"
+    numbers = set()
 
-    def get_paginated_data(url):
-        """Fetch paginated data from a given URL."""
-        data = []
-        page = 1
-        per_page = 100  # Number of results per page
+    for page_number, page_data in enumerate(paginate_pages(url, strict=strict), 1):
+        if page_number == 1 and page_data.get('total_count', 0) > 1000:
+            return None
 
-        while True:
-            paginated_url = f"{url}?per_page={per_page}&page={page}"
-            response = requests.get(paginated_url, headers=session['HEADERS'])
-            
-            if response.status_code != 200:
-                print(f"Error fetching data from {paginated_url}: {response.json()}")
-                break
+        numbers.update(item['number'] for item in page_data.get('items', []))
 
-            page_data = response.json()
-            if not page_data:  # Break if no more data
-                break
+    return numbers
 
-            data.extend(page_data)
-            page += 1
+def get_pr_entry(repo_full_name, pr_number, username, comment_index=None, strict=False):
 
-        return data
-        
-    def get_pr_commits(pr_number, username):
-        detailed_commits = []
+    # With <strict> (checkpointed scans) any failed lookup raises, so the PR is not recorded as handled
+    # Get pull request details
+    pr_details = get_pr_details(repo_full_name, pr_number)
+    if not pr_details:
+        if strict:
+            raise requests.HTTPError(f"PR details unavailable for {repo_full_name}#{pr_number}")
+        return None
+    
+    # Get filtered commits
+    print(f"Getting --> {pr_number}")
+    filtered_commits = get_pr_commits(repo_full_name, pr_number, username, strict)
+    print("Commits")
+    
+    # Get filtered review comments
+    filtered_comments = get_pr_comments(repo_full_name, pr_number, username, comment_index, strict)
+    print("Comments")
+    
+    return {
+        "pr_number": pr_number,
+        "pr_details": pr_details,
+        "commits": filtered_commits,
+        "comments": filtered_comments,
+    }
 
-        commits_url = f"{session['BASE_URL']}/repos/{repo_full_name}/pulls/{pr_number}/commits"
-        commits = get_paginated_data(commits_url)
-        
-        # Filter commits by username
-        filtered = [commit['sha'] for commit in commits if commit['author'] and commit['author']['login'] == username]
+def iter_pr_entries(repo_full_name, username, start_date, progress=None, comment_index=None):
 
-        for sha in filtered:
-            details = get_commit_details_from_SHA(repo_full_name,sha)
+    # Yields the user's PR entries as they are built
+    # <progress> ({'page': pages done, 'done': [PR numbers]}) lets a restart skip what was already handled
+    strict = progress is not None
+    progress = {'page': 0, 'done': []} if progress is None else progress
+    done = set(progress['done'])
 
-            if details:
-                detailed_commits.append(details)
-        
-        return detailed_commits
+    def finish_pr(pr_number):
+        progress['done'].append(pr_number)
+        done.add(pr_number)
 
-    def get_pr_comments(pr_number, username):
+    # GraphQL harvester -- falls back to the REST scan below if a query fails, which skips the PRs already handled
+    # Only a failing query falls back -- a failed PR build raises to the caller before the PR is marked done
+    if PR_HARVESTER == 'graphql':
+        harvest = harvest_prs_graphql(repo_full_name, start_date)
 
-        comments_data = []
+        while True:
+            try:
+                pr = next(harvest, None)
+            except requests.HTTPError as e:
+                print(f"{e} -- using the REST scan")
+                break
 
-        review_url = f"{session['BASE_URL']}/repos/{repo_full_name}/pulls/{pr_number}/reviews"
-        reviews = get_paginated_data(review_url)
+            if pr is None:
+                return
 
-        for review in reviews:
-            if review['user']['login'] == username:
-                state = review['state']
+            if pr['number'] in done:
+                continue
 
-                if state == 'APPROVED':
-                    data = {
-                        'state': "approved",
-                        'url': review['html_url'],
-                        'comment': review['body'] if review['body'] else None,
-                        'date': review['submitted_at'],
-                    }
-                    comments_data.append(data)
+            pr_entry = build_graphql_pr_entry(repo_full_name, pr, username, strict)
+            finish_pr(pr['number'])
 
-                elif state in ('CHANGES_REQUESTED', 'COMMENTED'):
-                    comment_url = review_url + f"/{review['id']}/comments"
-                    comments = get_paginated_data(comment_url)
+            if pr_entry:
+                yield pr_entry
 
-                    for comment in comments:
-                        if comment['user']['login'] == username:
+    base_url = f"{session['BASE_URL']}/repos/{repo_full_name}"
+    per_page = 100  # Adjust the number of results per page if necessary
 
-                            data = {
-                                'state': state.lower(),
-                                'url': comment['html_url'],
-                                'comment': comment.get('body'),
-                                'date': comment['updated_at'],
-                                'file': comment.get('path')
-                            }
-                            comments_data.append(data)
+    def get_pr_reviewers(pr_number):
+        #To HANDLE - If someone approves review, they are removed from requested_reviewers
+        review_url = f"{base_url}/pulls/{pr_number}/reviews?per_page={per_page}"
+        response = github_get(review_url, headers=session['HEADERS'])
 
-        return comments_data
-        
-    # ------------------------------
+        if response.status_code == 200:
+            return set(review['user']['login'] for review in response.json() if review['user'])
+        return set()
 
+    # Step 1: Get pull requests newest first, so the date cutoff is reliable
+    # Pages are followed one at a time -- prefetching would overshoot the cutoff
+    pulls_url = f"{base_url}/pulls?state=all&sort=created&direction=desc"
 
-    while True:
-        # Step 1: Get all pull requests with pagination
-        pulls_url = f"{base_url}/pulls?state=all&per_page={per_page}&page={page}"
-        response = requests.get(pulls_url, headers=session['HEADERS'])
-        
-        if response.status_code != 200:
-            print(f"Error fetching pull requests: {response.json()}")
-            break
+    start_page = progress['page'] + 1
+    reviewed = get_reviewed_prs(repo_full_name, username, start_date, strict)
 
-        pull_requests = response.json()
+    for page, pull_requests in enumerate(paginate_pages(pulls_url, per_page, prefetch=1, start_page=start_page, strict=strict), start_page):
 
-        # Break the loop if no more pull requests are returned
-        if not pull_requests:
-            break
+        # Step 2: Date cutoff and cheap membership checks from the list payload
+        window_reached = False
+        relevant = {}           # pr_number -> matched without a review lookup
+        review_only = []
 
-        # Step 2: Process each pull request
         for pr in pull_requests:
+            pr_date = datetime.strptime(pr['created_at'], "%Y-%m-%dT%H:%M:%SZ")
+
+            # Check Date boundary
+            if pr_date<start_date:
+                window_reached = True
+                break
+
+            # Handled before a restart
+            if pr['number'] in done:
+                continue
+
             pr_author = pr['user']['login']
             assigned_by = pr['assignee']['login'] if pr.get('assignee') else None
             assigned_to = [user['login'] for user in pr.get('assignees', [])]
-            pr_date = datetime.strptime(pr['created_at'], "%Y-%m-%dT%H:%M:%SZ")
-
             requested_reviewers = [reviewer['login'] for reviewer in pr.get('requested_reviewers', [])]
 
-            #To HANDLE - If someone approves review, they are removed from requested_reviewers
-            try:
-                review_url = f"{base_url}/pulls/{pr['number']}/reviews?per_page={per_page}"
-                response = requests.get(review_url, headers=session['HEADERS']).json()
-                requested_reviewers += list(set(user['user']['login'] for user in response))
-            except:
-                pass
+            # Check if the author, assignees or requested reviewers match the username
+            if pr_author == username or (username in requested_reviewers) or (username in assigned_to) or username==assigned_by:
+                relevant[pr['number']] = True
+            else:
+                relevant[pr['number']] = False
+                review_only.append(pr['number'])
 
-            # Check Date boundary
-            if pr_date<start_date:
-                return pull_details_list
+        # Step 3: Remaining PRs count if the user reviewed them -- per-PR lookups only past the search cap
+        if reviewed is None:
+            for pr_number, reviewers in zip(review_only, run_parallel(get_pr_reviewers, review_only)):
+                relevant[pr_number] = username in (reviewers or set())
+        else:
+            for pr_number in review_only:
+                relevant[pr_number] = pr_number in reviewed
 
-            # Check if the author or requested reviewers match the username
-            if pr_author == username or (username in requested_reviewers) or (username in assigned_to) or username==assigned_by:
-                pr_number = pr['number']
-                
-                # Get pull request details
-                pr_details = get_pr_details(repo_full_name, pr_number)
-                if not pr_details:
-                    continue
-                
-                # Get filtered commits
-                print(f"Getting --> {pr_number}")
-                filtered_commits = get_pr_commits(pr_number, username)
-                print("Commits")
-                
-                # Get filtered review comments
-                filtered_comments = get_pr_comments(pr_number, username)
-                print("Comments")
-                
-                # Collect details
-                pull_details_list.append({
-                    "pr_number": pr_number,
-                    "pr_details": pr_details,
-                    "commits": filtered_commits,
-                    "comments": filtered_comments,
-                })
+        for pr_number, matched in relevant.items():
+            pr_entry = get_pr_entry(repo_full_name, pr_number, username, comment_index, strict) if matched else None
+            finish_pr(pr_number)
 
-        # Increment the page number for the next request
-        page += 1
+            # Collect details
+            if pr_entry:
+                yield pr_entry
 
-    return pull_details_list
+        progress['page'] = page
+
+        if window_reached:
+            break
 
 def get_pr_details(repo_full_name, pr_number):
 
         url = f"{session['BASE_URL']}/repos/{repo_full_name}/pulls/{pr_number}"
-        response = requests.get(url, headers=session['HEADERS'])
+        response = github_get(url, headers=session['HEADERS'])
         
         if response.status_code == 200:
             data = response.json()
@@ -522,12 +1491,253 @@ def get_pr_details(repo_full_name, pr_number):
         else:
             print(f"Error fetching PR details for #{pr_number}: {response.json()}")
             return None
+
+# GraphQL PR Harvester ------------>
+# One paged query returns PRs with people, reviews, review comments and commit authors
+
+PR_HARVESTER = os.getenv('PR_HARVESTER', 'graphql')                    # 'graphql' or 'rest'
+GRAPHQL_PR_PAGE_SIZE = int(os.getenv('GRAPHQL_PR_PAGE_SIZE', 25))       # Keeps each query well below the node / cost limits
+GRAPHQL_MAX_COMMITS = 100
+GRAPHQL_MAX_REVIEWS = 50
+GRAPHQL_MAX_REVIEW_COMMENTS = 50
+
+PR_HARVEST_QUERY = '''
+query($owner: String!, $name: String!, $first: Int!, $cursor: String) {
+    repository(owner: $owner, name: $name) {
+        pullRequests(first: $first, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+            pageInfo { hasNextPage endCursor }
+            nodes {
+                number title state merged url createdAt additions deletions changedFiles
+                author { login }
+                assignees(first: 20) { nodes { login } }
+                labels(first: 20) { nodes { name } }
+                reviewRequests(first: 20) { nodes { requestedReviewer { ... on User { login } } } }
+                comments { totalCount }
+                commits(first: %d) {
+                    totalCount
+                    nodes { commit { oid author { user { login } } } }
+                }
+                reviews(first: %d) {
+                    totalCount
+                    nodes {
+                        state body url submittedAt
+                        author { login }
+                        comments(first: %d) {
+                            totalCount
+                            nodes { body url updatedAt path author { login } }
+                        }
+                    }
+                }
+            }
+        }
+    }
+    rateLimit { cost remaining }
+}
+''' % (GRAPHQL_MAX_COMMITS, GRAPHQL_MAX_REVIEWS, GRAPHQL_MAX_REVIEW_COMMENTS)
+
+def get_login(node):
+    return node['login'] if node else None
+
+def is_pr_truncated(pr):
+    return (pr['commits']['totalCount'] > GRAPHQL_MAX_COMMITS
+            or pr['reviews']['totalCount'] > GRAPHQL_MAX_REVIEWS
+            or any(review['comments']['totalCount'] > GRAPHQL_MAX_REVIEW_COMMENTS for review in pr['reviews']['nodes']))
+
+def build_graphql_pr_details(pr):
+
+    assignees = [get_login(user) for user in pr['assignees']['nodes']]
+
+    return {
+        "title": pr["title"],
+        "number": pr["number"],
+        "state": 'open' if pr['state'] == 'OPEN' else 'closed',
+        "merged": pr["merged"],
+        "url": pr["url"],
+        "date": pr['createdAt'],
+        "requested_reviewers": [get_login(request['requestedReviewer']) for request in pr['reviewRequests']['nodes'] if get_login(request['requestedReviewer'])],
+        "assigned_by": assignees[0] if assignees else None,
+        "assigned_to": assignees,
+        "labels": [label["name"] for label in pr["labels"]['nodes']],
+        "comments": pr["comments"]['totalCount'],
+        "review_comments": sum(review['comments']['totalCount'] for review in pr['reviews']['nodes']),
+        "commits": pr["commits"]['totalCount'],
+        "additions": pr["additions"],
+        "deletions": pr["deletions"],
+        "changed_files": pr["changedFiles"]
+    }
+
+def build_graphql_pr_comments(pr, username):
+
+    comments_data = []
+
+    for review in pr['reviews']['nodes']:
+        if get_login(review['author']) != username:
+            continue
+
+        state = review['state']
+
+        if state == 'APPROVED':
+            comments_data.append({
+                'state': "approved",
+                'url': review['url'],
+                'comment': review['body'] if review['body'] else None,
+                'date': review['submittedAt'],
+            })
+
+        elif state in ('CHANGES_REQUESTED', 'COMMENTED'):
+            for comment in review['comments']['nodes']:
+                if get_login(comment['author']) == username:
+                    comments_data.append({
+                        'state': state.lower(),
+                        'url': comment['url'],
+                        'comment': comment.get('body'),
+                        'date': comment['updatedAt'],
+                        'file': comment.get('path')
+                    })
+
+    return comments_data
+
+def harvest_prs_graphql(repo_full_name, start_date):
+
+    # Yields PR nodes created since start_date, one query page at a time; raises requests.HTTPError if the GraphQL endpoint fails
+    owner, name = repo_full_name.split('/', 1)
+    cursor = None
+
+    while True:
+        payload = {
+            "query": PR_HARVEST_QUERY,
+            "variables": {"owner": owner, "name": name, "first": GRAPHQL_PR_PAGE_SIZE, "cursor": cursor}
+        }
+        response = github_post(f"{session['BASE_URL']}/graphql", json=payload, headers=session['HEADERS'])
+
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Error fetching pull requests (GraphQL): {response.status_code} {response.text}", response=response)
+
+        result = response.json()
+        if result.get('errors') or not (result.get('data') or {}).get('repository'):
+            raise requests.HTTPError(f"Error fetching pull requests (GraphQL): {result.get('errors')}", response=response)
+
+        pull_requests = result['data']['repository']['pullRequests']
+
+        for pr in pull_requests['nodes']:
+            pr_date = datetime.strptime(pr['createdAt'], "%Y-%m-%dT%H:%M:%SZ")
+
+            # Check Date boundary -- PRs come newest first
+            if pr_date<start_date:
+                return
+
+            yield pr
+
+        if not pull_requests['pageInfo']['hasNextPage']:
+            return
+
+        cursor = pull_requests['pageInfo']['endCursor']
+
+def is_pr_participant(pr, username):
+    pr_details = build_graphql_pr_details(pr)
+    reviewers = [get_login(review['author']) for review in pr['reviews']['nodes']]
+
+    # Check if the author, reviewers or assignees match the username
+    return get_login(pr['author']) == username or username in pr_details['requested_reviewers'] or username in reviewers or username in pr_details['assigned_to']
+
+def build_graphql_pr_entry(repo_full_name, pr, username, strict=False):
+
+    if not is_pr_participant(pr, username):
+        return None
+
+    # Connections too large for one query -- use the REST path for this PR
+    if is_pr_truncated(pr):
+        return get_pr_entry(repo_full_name, pr['number'], username, strict=strict)
+
+    print(f"Getting --> {pr['number']}")
+    shas = [node['commit']['oid'] for node in pr['commits']['nodes'] if get_login((node['commit']['author'] or {}).get('user')) == username]
+
+    return {
+        "pr_number": pr['number'],
+        "pr_details": build_graphql_pr_details(pr),
+        "commits": get_commit_details_list(repo_full_name, shas, strict),
+        "comments": build_graphql_pr_comments(pr, username),
+    }
+
+# --
+
+
+# Sharded fetchers ------------>
+# One shard of the window each -- commits through since / until, issues and PRs through created-range search qualifiers
+
+def scan_commit_shard(repo_full_name, username, since, until, branches, commit_branches):
+
+    # <commit_branches> is shared by all shards; a commit's date puts it in exactly one of them
+    # A fresh <progress> makes page failures raise, so the shard is not marked done
+    return list(iter_global_commits(repo_full_name, format_shard_date(since), {username}, author=username, progress={},
+                                    commit_branches=commit_branches, until=format_shard_date(until), branches=branches))
+
+def scan_issue_shard(repo_full_name, username, since, until):
+
+    issues_details = {}
+    created = f"created:{format_shard_date(since)}..{format_shard_date(until)}"
+
+    # Issues the user created, then issues assigned to them
+    for role in ('author', 'assignee'):
+        for issue in iter_search_items(f"repo:{repo_full_name} is:issue {role}:{username} {created}", strict=True):
+            if issue['number'] not in issues_details:
+                issues_details[issue['number']] = build_issue_data(issue, username)
+
+    return list(issues_details.values())
+
+def scan_pr_shard(repo_full_name, username, since, until, comment_index=None):
+
+    created = f"created:{format_shard_date(since)}..{format_shard_date(until)}"
+    candidates = {}
+    reviewed = set()
+
+    # involves: covers author / assignee / commenters; reviews and review requests need their own qualifiers
+    for qualifier in ('involves', 'reviewed-by', 'review-requested'):
+        for pr in iter_search_items(f"repo:{repo_full_name} is:pr {qualifier}:{username} {created}", strict=True):
+            candidates[pr['number']] = pr
+            if qualifier != 'involves':
+                reviewed.add(pr['number'])
+
+    # Same membership rule as the listing scan -- mentions / plain comments do not count
+    pr_numbers = [number for number, pr in candidates.items()
+                  if number in reviewed or pr['user']['login'] == username or username in [user['login'] for user in pr.get('assignees', [])]]
+
+    # Strict builds -- a failed PR leaves the shard unfinished instead of dropping the PR
+    pr_entries = run_parallel(lambda number: get_pr_entry(repo_full_name, number, username, comment_index, strict=True), pr_numbers)
+
+    for number, pr_entry in zip(pr_numbers, pr_entries):
+        if pr_entry is None:
+            raise requests.HTTPError(f"PR details unavailable for {repo_full_name}#{number}")
+
+    return pr_entries
+
+def iter_sharded_commits(repo_full_name, username, shards, default_branch, progress=None, commit_branches=None):
+
+    branches = get_scan_branches(repo_full_name, default_branch)
+    commit_branches = {} if commit_branches is None else commit_branches
+
+    return iter_sharded(shards,
+                        lambda since, until: scan_commit_shard(repo_full_name, username, since, until, branches, commit_branches),
+                        progress)
+
+def iter_sharded_issues(repo_full_name, username, shards, progress=None):
+    records = iter_sharded(shards, lambda since, until: scan_issue_shard(repo_full_name, username, since, until), progress)
+    return iter_unique(records, lambda issue: issue['number'])
+
+def iter_sharded_prs(repo_full_name, username, shards, progress=None):
+    records = iter_sharded(shards, lambda since, until: scan_pr_shard(repo_full_name, username, since, until), progress)
+    return iter_unique(records, lambda pr_entry: pr_entry['pr_number'])
 # --
 
 
 # UPDATE FUNCTIONS ------------------------------>
 
-def update_repo_details(full_repo, enterprise, contributors, last_snapshot, start_date):
+DEFAULT_POLL_INTERVAL = 60     # seconds, when /events sends no X-Poll-Interval
+GAP_SYNC_OVERLAP = timedelta(hours=int(os.getenv('GAP_SYNC_OVERLAP_HOURS', 24)))
+EVENTS_FEED_PAGES = 3                       # the events feed serves at most 300 events ...
+EVENTS_FEED_RETENTION = timedelta(days=90)  # ... from the last 90 days
+
+def update_repo_details(full_repo, enterprise, contributors, last_snapshot, start_date, last_update=None):
 
     # Check for Public / Enterprise --> Set Session BASE_URL and HEADERS
     if enterprise:
@@ -543,16 +1753,23 @@ def update_repo_details(full_repo, enterprise, contributors, last_snapshot, star
     checkpoint_reached = False  # Last Saved Snapshot
     valid_date = True           # Window till start_date
     latest_snapshot_id = -1     # Initialize latest_snapshot_id to track the latest event ID
+    poll_interval = DEFAULT_POLL_INTERVAL
+    applied = 0
 
     new_updates = {}
+    touched = new_event_batch()
 
-    while (not checkpoint_reached) and valid_date and page<=3:
+    while (not checkpoint_reached) and valid_date and page<=EVENTS_FEED_PAGES:
         event_url = f"{BASE_URL}/repos/{full_repo}/events?per_page=100&page={page}"
-        response = requests.get(event_url, headers=HEADERS)
+        response = github_get(event_url, headers=HEADERS)
         
         if response.status_code == 200:
             data = response.json()
 
+            # GitHub asks pollers of the events feed to wait this long between checks
+            if page == 1:
+                poll_interval = int(response.headers.get('X-Poll-Interval', DEFAULT_POLL_INTERVAL))
+
             # If no more events are returned, break the loop
             if not data:
                 break
@@ -567,7 +1784,10 @@ def update_repo_details(full_repo, enterprise, contributors, last_snapshot, star
                     # No new data
                     if last_snapshot == event['id']:
                         print("Repo is Up to Date")
-                        return
+                        db['IBM_repositories'].update_one(
+                            {'host':get_host(BASE_URL), 'repo_name':full_repo},
+                            {'$set' : {'last_update':datetime.today(), 'poll_interval':poll_interval, 'recent_events':0}})
+                        return False
                     else:
                         # Set new snapshot
                         latest_snapshot_id = event['id']
@@ -578,15 +1798,6 @@ def update_repo_details(full_repo, enterprise, contributors, last_snapshot, star
 
             for event in data:
                 event_date = datetime.strptime(event['created_at'], "%Y-%m-%dT%H:%M:%SZ")
-                username = event['actor']['login']
-
-                # Initialize new user
-                if username not in new_updates:
-                    new_updates[username] = {
-                        'commits': [],
-                        'new_issues': [],
-                        'new_prs': []
-                        }
 
                 # Invalid Event
                 if (event['type'] not in github_events):
@@ -604,409 +1815,1607 @@ def update_repo_details(full_repo, enterprise, contributors, last_snapshot, star
                     valid_date = False
                     break
 
-                match event['type']:
-                    case 'IssuesEvent':
-                        new, (issue_no, data) = handle_issue_event(event, username)
-                        print(f"issue Update -- {issue_no}")
+                apply_event(event, full_repo, BASE_URL, HEADERS, new_updates, touched)
+                applied += 1
 
-                        if new:
-                            new_updates[username]['new_issues'] += [data]
+            # Increment the page number for the next request
+            page += 1
 
-                        else:
-                            # Assign the latest data
-                            if issue_no and (issue_no not in new_updates[username]):
-                                new_updates[username][issue_no] = data
+        else:
+            print(f"Failed to fetch events for {full_repo}, Status Code: {response.status_code}")
+            return   # Exit if the request fails
+    
 
-                    case 'PullRequestEvent':
-                        new, data = handle_pull_request_event(event, full_repo, username, HEADERS)
+    # Checkpoint lost only if the walk used the whole feed, or the last sync is older than the feed keeps events
+    # An empty / short feed without the snapshot just means nothing older is left to walk
+    feed_exhausted = page > EVENTS_FEED_PAGES
+    aged_out = last_update is not None and last_update < datetime.today() - EVENTS_FEED_RETENTION
+    gap = not checkpoint_reached and valid_date and (feed_exhausted or aged_out)
 
-                        if new:
-                            new_updates[username]['new_prs'] += [data]
-                        
-                        else:
-                            pr_no, data = data
+    # No new events and nothing lost -- keep the stored snapshot
+    if latest_snapshot_id == -1 and not gap:
+        print("Repo is Up to Date")
+        db['IBM_repositories'].update_one(
+            {'host':get_host(BASE_URL), 'repo_name':full_repo},
+            {'$set' : {'last_update':datetime.today(), 'poll_interval':poll_interval, 'recent_events':0}})
+        return False
 
-                            if pr_no not in new_updates[username]:
-                                new_updates[username][pr_no] = {'pr_details': None, 'commits': [], 'comments': []}
+    # PR details, PR commit lists and commit details for the whole batch, each fetched once
+    resolve_event_batch(full_repo, BASE_URL, HEADERS, new_updates, touched)
 
-                            new_updates[username][pr_no]['pr_details'] = data
+    if gap:
+        # Overlap covers clock skew; every write below is an upsert
+        since = max((last_update or start_date) - GAP_SYNC_OVERLAP, start_date)
+        print(f"Checkpoint not found -- catching up {full_repo} since {since}")
+        sync_repo_since(full_repo, since, contributors, start_date, new_updates)
+
+
+    # ---> Update database repo_details with the <new_updates> dict
 
-                    case 'PullRequestReviewEvent':
-                        pr_no,comments = handle_pull_request_review_event(event, username, HEADERS)
-                        pr_details = get_pr_details(event['repo']['name'], event['payload']['pull_request']['number'])
+    save_repo_updates(full_repo, get_host(BASE_URL), contributors, new_updates)
 
-                        if pr_no not in new_updates[username]:
-                            new_updates[username][pr_no] = {'pr_details': None, 'commits': [], 'comments': []}
-                        
-                        new_updates[username][pr_no]['comments'] += comments
+    # Set Latest Snapshot for Repos
+    db['IBM_repositories'].update_one(
+        {'host':get_host(BASE_URL), 'repo_name':full_repo},
+        {'$set' : {'snapshot':latest_snapshot_id if latest_snapshot_id != -1 else last_snapshot, 'last_update':datetime.today(), 'poll_interval':poll_interval, 'recent_events':applied, 'last_sync':'gap' if gap else 'events'}})
 
-                        if pr_details:
-                            new_updates[username][pr_no]['pr_details'] = pr_details
+    return True
 
-                    case 'PushEvent':
-                        pr_no,commits = handle_push_event(event, full_repo, BASE_URL, HEADERS)
+def sync_repo_since(full_repo, since, logins, start_date, new_updates):
 
-                        for commit in commits:
-                            
-                            commitor = commit['commit']['author']['name']
-                            commit_data = get_commit_details_from_SHA(full_repo, commit['sha'])
+    # Catch-up from the since / sort=updated listings, merged into the same <new_updates> dict as apply_event
+    since_param = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+    base_url = f"{session['BASE_URL']}/repos/{full_repo}"
 
-                            if commitor not in new_updates:
-                                new_updates[commitor] = {
-                                    'commits': [],
-                                    'new_issues': [],
-                                    'new_prs': []
-                                    }
+    # Issues updated since the last sync
+    for login, issues in scan_repo_issues(full_repo, since_param, logins).items():
+        init_user_updates(new_updates, login)
+        new_updates[login]['new_issues'] += issues
 
-                            if not pr_no:
-                                new_updates[commitor]['commits'] += [commit_data]
-                                print("Global Commit")
-                                
-                            else:
-                                if pr_no not in new_updates[commitor]:
-                                    new_updates[commitor][pr_no] = {'pr_details': None, 'commits': [], 'comments': []}
+    # Commits pushed since the last sync, across branches
+    for login, commits in scan_global_commits(full_repo, since_param, logins).items():
+        init_user_updates(new_updates, login)
+        new_updates[login]['commits'] += commits
 
-                                new_updates[commitor][pr_no]['commits'] += [commit]
-                                print(f"PR Commit - {commitor}", pr_no)
+    # PRs updated since the last sync -- newest update first, so the walk stops at the first older one
+    pulls = []
+    for pull_requests in paginate_pages(f"{base_url}/pulls?state=all&sort=updated&direction=desc", prefetch=1):
+        window_reached = False
 
-                                pr_details = get_pr_details(full_repo, pr_no)
-                                if pr_details:
-                                    new_updates[commitor][pr_no]['pr_details'] = pr_details
+        for pr in pull_requests:
+            if datetime.strptime(pr['updated_at'], "%Y-%m-%dT%H:%M:%SZ") < since:
+                window_reached = True
+                break
 
-                    case _:
-                        print(f"Unwanted Event -- {event['type']}")
+            # Only PRs inside the extraction window are tracked
+            if datetime.strptime(pr['created_at'], "%Y-%m-%dT%H:%M:%SZ") >= start_date:
+                pulls.append(pr)
 
-            # Increment the page number for the next request
-            page += 1
+        if window_reached:
+            break
+
+    for login, pr_entries in split_prs_by_login(full_repo, pulls, logins, since).items():
+        init_user_updates(new_updates, login)
+        new_updates[login]['new_prs'] += pr_entries
+
+def init_user_updates(new_updates, username):
+
+    # Initialize new user
+    if username not in new_updates:
+        new_updates[username] = {
+            'commits': [],
+            'new_issues': [],
+            'new_prs': []
+            }
+
+def new_event_batch():
+    return {
+        'prs': {},          # pr_number -> logins whose entry needs fresh PR details
+        'pushes': {}        # ref -> {'head': newest pushed sha, 'commits': [(login, sha)]}
+    }
+
+def apply_event(event, full_repo, BASE_URL, HEADERS, new_updates, touched):
+
+    # Merge one Events API style event into the <new_updates> dict
+    # PR details and pushed commits are only noted in <touched>; resolve_event_batch fetches them once
+    username = event['actor']['login']
+    init_user_updates(new_updates, username)
+
+    match event['type']:
+        case 'IssuesEvent':
+            new, (issue_no, data) = handle_issue_event(event, username)
+            print(f"issue Update -- {issue_no}")
+
+            if new:
+                new_updates[username]['new_issues'] += [data]
+
+            else:
+                # Assign the latest data
+                if issue_no and (issue_no not in new_updates[username]):
+                    new_updates[username][issue_no] = data
+
+        case 'PullRequestEvent':
+            new, data = handle_pull_request_event(event, full_repo, username, HEADERS)
 
+            if new:
+                new_updates[username]['new_prs'] += [data]
+            
+            else:
+                pr_no, data = data
+
+                if pr_no not in new_updates[username]:
+                    new_updates[username][pr_no] = {'pr_details': None, 'commits': [], 'comments': []}
+
+                new_updates[username][pr_no]['pr_details'] = data
+
+        case 'PullRequestReviewEvent':
+            pr_no,comments = handle_pull_request_review_event(event, username, HEADERS)
+
+            if pr_no not in new_updates[username]:
+                new_updates[username][pr_no] = {'pr_details': None, 'commits': [], 'comments': []}
+            
+            new_updates[username][pr_no]['comments'] += comments
+            touched['prs'].setdefault(pr_no, set()).add(username)
+
+        case 'PushEvent':
+            commits = event['payload'].get('commits') or []
+            push = touched['pushes'].setdefault(event['payload'].get('ref'), {'head': None, 'commits': []})
+
+            # Events come newest first -- the first push seen carries the branch head
+            if commits and not push['head']:
+                push['head'] = commits[-1]['sha']
+
+            # Every commit of the push; webhook payloads name the author, the events feed only the pusher
+            for commit in commits:
+                push['commits'].append(((commit.get('author') or {}).get('username') or username, commit['sha']))
+
+        case _:
+            print(f"Unwanted Event -- {event['type']}")
+
+def save_repo_updates(full_repo, host, contributors, new_updates):
+
+    data_collection = db['IBM_github_data']
+    operations = {}
+
+    # Contributors that already hold this repo -- one query for all of them
+    logins = [username for username in new_updates if username in contributors]
+    existing = {doc['user_info']['login'] for doc in data_collection.find(
+        {'user_info.login': {'$in': logins}, 'repos': {'$elemMatch': {'host': host, 'repo': full_repo, 'status': 'done'}}},
+        {'user_info.login': 1}
+    )}
+
+    for username in logins:
+
+        # This is a new repo for the given user --> perform full extraction (This should ideally not occur)
+        if username not in existing:
+            continue
+
+        # Only the changed entries are written
+        merge_storage_ops(operations, build_update_ops(username, host, full_repo, new_updates[username]))
+
+    if operations:
+        write_storage_ops(operations)
+
+def handle_issue_event(event, username):
+
+    issue = event['payload']['issue']        
+
+    issue_data = {
+        'url': issue['html_url'],
+        'title': issue['title'],
+        'number': issue['number'],
+        'created_at': issue['created_at'],
+        'updated_at': issue['updated_at'],
+        'labels': issue['labels'],
+        'state': issue['state'],
+        'type': 'created' if issue['user']['login'] == username else 'assigned'
+    }
+
+    if event['payload']['action'] == 'opened':
+        return True, (issue['number'], issue_data)
+    else:
+        return False, (issue['number'], issue_data)
+    
+def handle_pull_request_event(event, full_repo, username, HEADERS):
+
+    data = event['payload']['pull_request']
+    pr_details = {
+            "title": data["title"],
+            "number": data["number"],
+            "state": data["state"],
+            "merged": data["merged"],
+            "url": data["html_url"],
+            "date": data['created_at'],
+            "requested_reviewers": [reviewer["login"] for reviewer in data["requested_reviewers"]],
+            "assigned_by": data['assignee']['login'] if data.get('assignee') else None,
+            "assigned_to": [user['login'] for user in data.get('assignees', [])],
+            "labels": [label["name"] for label in data["labels"]],
+            "comments": data["comments"],
+            "review_comments": data["review_comments"],
+            "commits": data["commits"],
+            "additions": data["additions"],
+            "deletions": data["deletions"],
+            "changed_files": data["changed_files"]
+        }
+
+    if event['payload']['action'] == 'opened':
+        # New pr object
+        new_pr = {'pr_number': data['number'],
+                  'pr_details': None,
+                  'commits': [],
+                  'comments': []
+                }
+
+        new_pr['pr_details'] = pr_details
+
+        # Fetch Commits
+        commits_url = data['commits_url']
+        response = github_get(commits_url, headers=HEADERS)
+
+        if response.status_code == 200:
+            fetched_commits = response.json()
         else:
-            print(f"Failed to fetch events for {full_repo}, Status Code: {response.status_code}")
-            return   # Exit if the request fails
+            fetched_commits = []
+        
+        
+        # Filter commits by username
+        filtered = [commit['sha'] for commit in fetched_commits if commit['author'] and commit['author']['login'] == username]
+        commit_details = []
+
+        for details in get_commit_details_batch(full_repo, filtered):
+
+            if details:
+                commit_details.append(details)
+
+        new_pr['commits'] = commit_details
+
+        return True, new_pr
+        
+    else:
+        # Return the current PR directly
+        return False, (pr_details['number'], pr_details)
+
+def handle_pull_request_review_event(event,username,HEADERS):
+    
+    comments_data = []
+    review = event['payload']['review']
     
+    # Review Approved  |OR|  # If event has body -- then it was a single comment and no comments exist further
+    if review['state'] == 'approved' or review['body']:
+        data = {
+            'state': review['state'],
+            'url': review['html_url'],
+            'comment': review['body'] if review['body'] else None,
+            'date': review['submitted_at'],
+        }
+        comments_data.append(data)
+
+    elif review['state'] in ('changes_requested', 'commented'):
+
+        # Fetch all the comments
+        comment_url = review['pull_request_url'] + f"/reviews/{review['id']}/comments"
+        response = github_get(comment_url, headers=HEADERS)
 
-    # If checkpoint not found -- 90 days gap  
-    # if not checkpoint_reached:
-    #     return 'not_found'
+        if response.status_code == 200:
+            fetched_comments = response.json()
+        else:
+            fetched_comments = []
 
 
-    # ---> Update database repo_details with the <new_updates> dict
+        for comment in fetched_comments:
+            if comment['user']['login'] == username:
+                data = {
+                        'state': review['state'],
+                        'url': comment['html_url'],
+                        'comment': comment.get('body'),
+                        'date': comment['updated_at'],
+                        'file': comment.get('path')
+                    }
+                comments_data.append(data)
+    
+    return event['payload']['pull_request']['number'],comments_data
+
+def get_commit_pr(full_repo, commit_sha, BASE_URL, HEADERS):
+
+    pull_url = f"{BASE_URL}/repos/{full_repo}/commits/{commit_sha}/pulls"
+    response = github_get(pull_url, headers=HEADERS)
+    
+    if response.status_code == 200:
+        pulls = response.json()
+
+        # If there are associated pull requests, This is valid pr_commit
+        if pulls:
+            return pulls[0]['number']
+
+    else:
+        print(f"Error fetching pull requests: {response.status_code} - {response.text}")
+    
+    return None
+
+def resolve_event_batch(full_repo, BASE_URL, HEADERS, new_updates, touched):
+
+    # Which PR each pushed branch belongs to -- one lookup per ref, on its newest head
+    refs = [ref for ref, push in touched['pushes'].items() if push['head']]
+    ref_prs = run_parallel(lambda ref: get_commit_pr(full_repo, touched['pushes'][ref]['head'], BASE_URL, HEADERS), refs)
+
+    global_commits = {}         # sha -> (login, [branches])
+    pushed_prs = []
+    for ref, pr_no in zip(refs, ref_prs):
+        if pr_no:
+            pushed_prs.append(pr_no)
+            continue
+
+        branch = ref.removeprefix('refs/heads/') if ref else None
+        for login, sha in touched['pushes'][ref]['commits']:
+            _, branches = global_commits.setdefault(sha, (login, []))
+            if branch and branch not in branches:
+                branches.append(branch)
+
+    # PR commit lists -- once per PR, split by author
+    pr_commits = []             # (login, pr_no, sha)
+    pushed_prs = list(dict.fromkeys(pushed_prs))
+    commit_lists = run_parallel(lambda pr_no: get_paginated_data(f"{BASE_URL}/repos/{full_repo}/pulls/{pr_no}/commits"), pushed_prs)
+
+    for pr_no, commits in zip(pushed_prs, commit_lists):
+        for commit in commits or []:
+            login = get_login(commit['author'])
+            if login:
+                pr_commits.append((login, pr_no, commit['sha']))
+                touched['prs'].setdefault(pr_no, set()).add(login)
+
+    # Commit details for every sha of the batch
+    shas = list(dict.fromkeys(list(global_commits) + [sha for _, _, sha in pr_commits]))
+    details = dict(zip(shas, get_commit_details_batch(full_repo, shas)))
+
+    for sha, (login, branches) in global_commits.items():
+        if details.get(sha):
+            # Same shape as extracted global commits -- the PR path may share these details
+            commit = dict(details[sha], branch=branches[0] if branches else None, branches=branches, merged=False)
+
+            init_user_updates(new_updates, login)
+            new_updates[login]['commits'] += [commit]
+            print("Global Commit")
+
+    for login, pr_no, sha in pr_commits:
+        if details.get(sha):
+            init_user_updates(new_updates, login)
+            if pr_no not in new_updates[login]:
+                new_updates[login][pr_no] = {'pr_details': None, 'commits': [], 'comments': []}
+
+            new_updates[login][pr_no]['commits'] += [details[sha]]
+            print(f"PR Commit - {login}", pr_no)
+
+    # PR details -- once per touched PR
+    pr_numbers = list(touched['prs'])
+    for pr_no, pr_details in zip(pr_numbers, run_parallel(lambda pr_no: get_pr_details(full_repo, pr_no), pr_numbers)):
+        if not pr_details:
+            continue
+
+        for login in touched['prs'][pr_no]:
+            init_user_updates(new_updates, login)
+            if pr_no not in new_updates[login]:
+                new_updates[login][pr_no] = {'pr_details': None, 'commits': [], 'comments': []}
+
+            new_updates[login][pr_no]['pr_details'] = pr_details
+
+
+
+
+# NORMALIZED STORAGE ------------------------------>
+# Commits, pull requests, reviews and issues each live in their own collection keyed by (host, repo, sha / number)
+# IBM_github_data keeps user_info plus a `repos` list of {host, repo, snapshot, status} per extracted repo
+
+REPO_DETAIL_KEYS = ('commits', 'issues', 'pull_requests', 'snapshot')
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 100))     # records per bulk write while extracting
+STORAGE_COLLECTIONS = ('IBM_repositories', 'IBM_commits', 'IBM_issues', 'IBM_pull_requests', 'IBM_reviews', 'IBM_github_data')
+
+STORAGE_INDEXES = {
+    'IBM_commits': [
+        ([('host', ASCENDING), ('repo', ASCENDING), ('pr_number', ASCENDING), ('sha', ASCENDING)], {'unique': True}),
+        ([('host', ASCENDING), ('repo', ASCENDING), ('login', ASCENDING), ('pr_number', ASCENDING)], {}),
+    ],
+    'IBM_issues': [
+        ([('host', ASCENDING), ('repo', ASCENDING), ('number', ASCENDING)], {'unique': True}),
+        ([('host', ASCENDING), ('repo', ASCENDING), ('contributors.login', ASCENDING)], {}),
+    ],
+    'IBM_pull_requests': [
+        ([('host', ASCENDING), ('repo', ASCENDING), ('number', ASCENDING)], {'unique': True}),
+        ([('host', ASCENDING), ('repo', ASCENDING), ('contributors', ASCENDING)], {}),
+    ],
+    'IBM_reviews': [
+        ([('host', ASCENDING), ('repo', ASCENDING), ('pr_number', ASCENDING), ('login', ASCENDING), ('url', ASCENDING), ('date', ASCENDING)], {'unique': True}),
+    ],
+    'IBM_github_data': [
+        ([('repos.host', ASCENDING), ('repos.repo', ASCENDING)], {}),
+    ],
+    'IBM_repositories': [
+        ([('host', ASCENDING), ('repo_name', ASCENDING)], {'unique': True}),
+    ],
+}
+
+# Replaced by the keys above -- would block the same owner/name on the other host
+LEGACY_INDEXES = {
+    'IBM_repositories': ['repo_name_1'],
+}
+
+storage_state = {'indexed': False}
+
+def get_host(base_url=None):
+    return urlparse(base_url or session['BASE_URL']).netloc
+
+def drop_legacy_indexes():
+    for name, index_names in LEGACY_INDEXES.items():
+        for index_name in set(index_names) & set(db[name].index_information()):
+            db[name].drop_index(index_name)
+
+def create_storage_indexes():
+    drop_legacy_indexes()
+
+    for name, indexes in STORAGE_INDEXES.items():
+        for keys, options in indexes:
+            db[name].create_index(keys, **options)
+    storage_state['indexed'] = True
+
+def build_user_repo_ops(login, host, full_repo, entry, user_info=None):
+
+    # Replace the user's entry for this repo
+    update = {'$push': {'repos': {'host': host, 'repo': full_repo, **entry}}}
+    if user_info:
+        update['$set'] = {'user_info': user_info}
+
+    return [
+        UpdateOne({'user_info.login': login}, {'$pull': {'repos': {'host': host, 'repo': full_repo}}}),
+        UpdateOne({'user_info.login': login}, update, upsert=True)
+    ]
+
+def set_user_repo_entry(login, host, full_repo, entry, user_info=None):
+    db['IBM_github_data'].bulk_write(build_user_repo_ops(login, host, full_repo, entry, user_info))
+
+def build_commit_op(key, login, pr_number, commit):
+
+    if pr_number is not None:
+        return UpdateOne({**key, 'pr_number': pr_number, 'sha': commit['sha']}, {'$set': {'login': login, 'commit': commit}}, upsert=True)
+
+    # Global commits are met again on other branches -- merge the branch list instead of replacing it
+    fields = {f"commit.{name}": value for name, value in commit.items() if name not in ('branch', 'branches')}
+
+    return UpdateOne({**key, 'pr_number': None, 'sha': commit['sha']}, {
+        '$set': {'login': login, **fields},
+        '$setOnInsert': {'commit.branch': commit.get('branch')},
+        '$addToSet': {'commit.branches': {'$each': commit.get('branches') or []}}
+    }, upsert=True)
+
+def build_commit_branch_op(key, login, sha, branch):
+    return UpdateOne({**key, 'pr_number': None, 'sha': sha, 'login': login}, {'$addToSet': {'commit.branches': branch}})
+
+def build_issue_ops(key, login, issue):
+    issue_data = {name: value for name, value in issue.items() if name != 'type'}
+
+    return [
+        UpdateOne({**key, 'number': issue['number']}, {'$pull': {'contributors': {'login': login}}}),
+        UpdateOne({**key, 'number': issue['number']},
+                  {'$set': {'issue': issue_data}, '$push': {'contributors': {'login': login, 'type': issue.get('type')}}},
+                  upsert=True)
+    ]
+
+def build_pr_op(key, login, pr_number, pr_details):
+    update = {'$addToSet': {'contributors': login}}
+    if pr_details:
+        update['$set'] = {'details': pr_details}
+
+    return UpdateOne({**key, 'number': pr_number}, update, upsert=True)
+
+def build_review_op(key, login, pr_number, comment):
+    return UpdateOne({**key, 'pr_number': pr_number, 'login': login, 'url': comment.get('url'), 'date': comment.get('date')},
+                     {'$set': comment}, upsert=True)
+
+def build_clear_ops(login, host, full_repo):
+
+    # Drop the user's previous rows for this repo (ops run in order per collection)
+    key = {'host': host, 'repo': full_repo}
+    ops = {name: [] for name in STORAGE_COLLECTIONS}
+
+    ops['IBM_commits'].append(DeleteMany({**key, 'login': login}))
+    ops['IBM_reviews'].append(DeleteMany({**key, 'login': login}))
+    ops['IBM_issues'].append(UpdateMany({**key, 'contributors.login': login}, {'$pull': {'contributors': {'login': login}}}))
+    ops['IBM_pull_requests'].append(UpdateMany({**key, 'contributors': login}, {'$pull': {'contributors': login}}))
+
+    return ops
+
+def build_record_ops(login, host, full_repo, commits=(), issues=(), pull_requests=()):
+
+    key = {'host': host, 'repo': full_repo}
+    ops = {name: [] for name in STORAGE_COLLECTIONS}
+
+    for commit in commits:
+        ops['IBM_commits'].append(build_commit_op(key, login, None, commit))
+
+    for issue in issues:
+        ops['IBM_issues'] += build_issue_ops(key, login, issue)
+
+    for pr in pull_requests:
+        ops['IBM_pull_requests'].append(build_pr_op(key, login, pr['pr_number'], pr.get('pr_details')))
+
+        for commit in pr.get('commits', []):
+            ops['IBM_commits'].append(build_commit_op(key, login, pr['pr_number'], commit))
+
+        for comment in pr.get('comments', []):
+            ops['IBM_reviews'].append(build_review_op(key, login, pr['pr_number'], comment))
+
+    return ops
+
+def build_storage_ops(user_info, host, full_repo, repo_details, replace=True):
+
+    login = user_info['login']
+    ops = build_clear_ops(login, host, full_repo) if replace else {name: [] for name in STORAGE_COLLECTIONS}
 
+    metadata = {name: value for name, value in repo_details.items() if name not in REPO_DETAIL_KEYS}
+    ops['IBM_repositories'].append(UpdateOne(
+        {'host': host, 'repo_name': full_repo},
+        {'$set': {'details': metadata}, '$addToSet': {'contributors': login}},
+        upsert=True
+    ))
+
+    merge_storage_ops(ops, build_record_ops(login, host, full_repo,
+                                            repo_details.get('commits', []),
+                                            repo_details.get('issues', []),
+                                            repo_details.get('pull_requests', [])))
+
+    entry = {'snapshot': repo_details.get('snapshot'), 'status': 'done', 'updated_at': datetime.today()}
+    ops['IBM_github_data'] += build_user_repo_ops(login, host, full_repo, entry, user_info)
+
+    return ops
+
+def build_update_ops(login, host, full_repo, updates):
+
+    # Incremental changes from update_repo_details -- new entries are upserted, changed ones updated by number
+    key = {'host': host, 'repo': full_repo}
+    ops = {name: [] for name in STORAGE_COLLECTIONS}
+
+    for commit in updates.get('commits', []):
+        if commit:
+            ops['IBM_commits'].append(build_commit_op(key, login, None, commit))
+
+    for issue in updates.get('new_issues', []):
+        ops['IBM_issues'] += build_issue_ops(key, login, issue)
+
+    for pr in updates.get('new_prs', []):
+        ops['IBM_pull_requests'].append(build_pr_op(key, login, pr['pr_number'], pr.get('pr_details')))
+        ops['IBM_commits'] += [build_commit_op(key, login, pr['pr_number'], commit) for commit in pr.get('commits', [])]
+        ops['IBM_reviews'] += [build_review_op(key, login, pr['pr_number'], comment) for comment in pr.get('comments', [])]
+
+    for number, changes in updates.items():
+        if number in ('commits', 'new_issues', 'new_prs'):
+            continue
+
+        # Issue change -- only for issues the user already holds
+        if 'pr_details' not in changes:
+            issue_data = {name: value for name, value in changes.items() if name != 'type'}
+            ops['IBM_issues'].append(UpdateOne({**key, 'number': number, 'contributors.login': login}, {'$set': {'issue': issue_data}}))
+            continue
+
+        # PR change -- details replaced, commits replaced, comments appended
+        ops['IBM_pull_requests'].append(build_pr_op(key, login, number, changes['pr_details']))
+
+        if changes['commits']:
+            ops['IBM_commits'].append(DeleteMany({**key, 'login': login, 'pr_number': number}))
+            ops['IBM_commits'] += [build_commit_op(key, login, number, commit) for commit in changes['commits']]
+
+        ops['IBM_reviews'] += [build_review_op(key, login, number, comment) for comment in changes['comments']]
+
+    return ops
+
+def merge_storage_ops(ops, more_ops):
+    for name, col_ops in more_ops.items():
+        ops.setdefault(name, []).extend(col_ops)
+    return ops
+
+def stream_to_storage(records, build_ops, on_flush=None, batch_size=None):
+
+    # Writes records in bounded batches while the generator produces them; returns how many were written
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    batch, written = [], 0
+
+    for record in records:
+        batch.append(record)
+
+        if len(batch) >= batch_size:
+            write_storage_ops(build_ops(batch))
+            written += len(batch)
+            batch = []
+
+            if on_flush:
+                on_flush(written)
+
+    if batch:
+        write_storage_ops(build_ops(batch))
+        written += len(batch)
+
+    if on_flush:
+        on_flush(written)
+
+    return written
+
+def write_storage_ops(ops):
+
+    if not storage_state['indexed']:
+        create_storage_indexes()
+
+    # Collections in dependency order; the user entry (status 'done') goes last
+    for name in STORAGE_COLLECTIONS:
+        if ops.get(name):
+            db[name].bulk_write(ops[name], ordered=True)
+
+def load_repo_details(login, host, full_repo, partial=False):
+
+    # Rebuild the per-user repo_details JSON from the normalized collections
+    # <partial> also reads an extraction in progress -- whatever rows are stored so far
+    key = {'host': host, 'repo': full_repo}
+    statuses = ['done', 'extracting'] if partial else ['done']
+
+    pipeline = [
+        {'$match': {'user_info.login': login}},
+        {'$unwind': '$repos'},
+        {'$match': {'repos.host': host, 'repos.repo': full_repo, 'repos.status': {'$in': statuses}}},
+        {'$lookup': {
+            'from': 'IBM_repositories',
+            'pipeline': [{'$match': {'host': host, 'repo_name': full_repo}}, {'$project': {'_id': 0, 'details': 1}}],
+            'as': 'repository'
+        }},
+        {'$lookup': {
+            'from': 'IBM_commits',
+            'pipeline': [
+                {'$match': {**key, 'login': login, 'pr_number': None}},
+                {'$sort': {'commit.date': -1}},
+                {'$replaceRoot': {'newRoot': '$commit'}}
+            ],
+            'as': 'commits'
+        }},
+        {'$lookup': {
+            'from': 'IBM_issues',
+            'pipeline': [
+                {'$match': {**key, 'contributors.login': login}},
+                {'$sort': {'issue.created_at': -1}},
+                {'$replaceRoot': {'newRoot': {'$mergeObjects': [
+                    '$issue',
+                    {'type': {'$arrayElemAt': [
+                        {'$map': {
+                            'input': {'$filter': {'input': '$contributors', 'cond': {'$eq': ['$$this.login', login]}}},
+                            'in': '$$this.type'
+                        }}, 0]}}
+                ]}}}
+            ],
+            'as': 'issues'
+        }},
+        {'$lookup': {
+            'from': 'IBM_pull_requests',
+            'pipeline': [
+                {'$match': {**key, 'contributors': login}},
+                {'$sort': {'details.date': -1}},
+                {'$lookup': {
+                    'from': 'IBM_commits',
+                    'let': {'number': '$number'},
+                    'pipeline': [
+                        {'$match': {**key, 'login': login, '$expr': {'$eq': ['$pr_number', '$$number']}}},
+                        {'$sort': {'commit.date': 1}},
+                        {'$replaceRoot': {'newRoot': '$commit'}}
+                    ],
+                    'as': 'commits'
+                }},
+                {'$lookup': {
+                    'from': 'IBM_reviews',
+                    'let': {'number': '$number'},
+                    'pipeline': [
+                        {'$match': {**key, 'login': login, '$expr': {'$eq': ['$pr_number', '$$number']}}},
+                        {'$sort': {'date': 1}},
+                        {'$project': {'_id': 0, 'host': 0, 'repo': 0, 'pr_number': 0, 'login': 0}}
+                    ],
+                    'as': 'comments'
+                }},
+                {'$project': {'_id': 0, 'pr_number': '$number', 'pr_details': '$details', 'commits': 1, 'comments': 1}}
+            ],
+            'as': 'pull_requests'
+        }},
+        {'$replaceRoot': {'newRoot': {'$mergeObjects': [
+            {'$ifNull': [{'$arrayElemAt': ['$repository.details', 0]}, {}]},
+            {'commits': '$commits', 'issues': '$issues', 'pull_requests': '$pull_requests', 'snapshot': '$repos.snapshot'}
+        ]}}}
+    ]
+
+    result = list(db['IBM_github_data'].aggregate(pipeline))
+    return result[0] if result else None
+
+def migrate_legacy_user_data():
+
+    # Old layout -- one `owner/repo` field per repo on the user document, holding the whole repo_details
     data_collection = db['IBM_github_data']
-    repo_collection = db['IBM_repositories']
+    mappings_collection = db['IBM_user_mappings']
+    create_storage_indexes()
 
-    for username in new_updates:
+    migrated = 0
 
-        # Check if valid username
-        if username not in contributors:
+    for doc in data_collection.find({}):
+        user_info = doc.get('user_info') or {}
+        login = user_info.get('login')
+        legacy_repos = {name: value for name, value in doc.items() if '/' in name}
+
+        if not login or not legacy_repos:
             continue
 
-        result = data_collection.find_one({'user_info.login':username})
-        repo_details = result.get(full_repo,None) if result else None
+        mapping = mappings_collection.find_one({'$or': [{'public': login}, {'enterprise': login}]}) or {}
+
+        for full_repo, repo_details in legacy_repos.items():
+
+            # False marks an extraction that never finished -- nothing to carry over
+            if isinstance(repo_details, dict):
+                host = "api.github.ibm.com" if full_repo in mapping.get('enterprise_repos', []) else "api.github.com"
+                write_storage_ops(build_storage_ops(user_info, host, full_repo, repo_details))
+                migrated += 1
+
+            data_collection.update_one({'_id': doc['_id']}, {'$unset': {full_repo: ''}})
+
+        print(f"Migrated {login} -> {list(legacy_repos)}")
+
+    # Repository documents from before the (host, repo_name) key -- same host rule as above
+    for repo in db['IBM_repositories'].find({'host': {'$exists': False}}, {'repo_name': 1}):
+        enterprise = mappings_collection.find_one({'enterprise_repos': repo['repo_name']}, {'_id': 1}) is not None
+        db['IBM_repositories'].update_one({'_id': repo['_id']}, {'$set': {'host': "api.github.ibm.com" if enterprise else "api.github.com"}})
+
+    print(f"Migration complete -- {migrated} user repos")
+
+    return migrated
+
+@app.cli.command('migrate-storage')
+def migrate_storage_command():
+    """Move per-user repo_details into the normalized collections."""
+    migrate_legacy_user_data()
+
+
+# INDEX BOOTSTRAP ------------------------------>
+# Hot lookups of the routes / jobs; unique where the data allows it, plain index otherwise
+
+APP_INDEXES = {
+    'IBM_github_data': [
+        ([('user_info.login', ASCENDING)], {'unique': True}),
+    ],
+    'IBM_user_mappings': [
+        ([('login', ASCENDING)], {'unique': True}),
+        ([('public', ASCENDING)], {'unique': True, 'partialFilterExpression': {'public': {'$type': 'string'}}}),
+        ([('enterprise', ASCENDING)], {'unique': True, 'partialFilterExpression': {'enterprise': {'$type': 'string'}}}),
+        ([('public_repos', ASCENDING)], {}),
+        ([('enterprise_repos', ASCENDING)], {}),
+    ],
+    'IBM_extraction_jobs': [
+        ([('key', ASCENDING), ('status', ASCENDING)], {}),
+        ([('key', ASCENDING)], {'unique': True, 'partialFilterExpression': {'active': True}}),
+    ],
+    'IBM_refresh_runs': [
+        ([('status', ASCENDING), ('started_at', ASCENDING)], {}),
+    ],
+    'IBM_http_cache': [
+        ([('last_used', ASCENDING)], {}),
+    ],
+    'IBM_identity_cache': [
+        ([('fetched_at', ASCENDING)], {'expireAfterSeconds': IDENTITY_MAX_AGE}),
+    ],
+}
 
-        # This is a new repo for the given user --> perform full extraction (This should ideally not occur)
-        if not repo_details:
+# Query shapes used in this module -- (collection, filter) with sample values
+QUERY_SHAPES = [
+    ('IBM_github_data', {'user_info.login': 'octocat'}),
+    ('IBM_github_data', {'user_info.login': {'$in': ['octocat', 'hubot']}}),
+    ('IBM_user_mappings', {'login': 'octocat'}),
+    ('IBM_user_mappings', {'public': 'octocat'}),
+    ('IBM_user_mappings', {'enterprise': 'octocat'}),
+    ('IBM_user_mappings', {'$or': [{'public': 'octocat'}, {'enterprise': 'octocat'}]}),
+    ('IBM_user_mappings', {'public_repos': 'octo/repo'}),
+    ('IBM_user_mappings', {'enterprise_repos': 'octo/repo'}),
+    ('IBM_repositories', {'host': 'api.github.com', 'repo_name': 'octo/repo'}),
+    ('IBM_extraction_jobs', {'key': 'public:octocat:octo/repo', 'active': True}),
+    ('IBM_commits', {'host': 'api.github.com', 'repo': 'octo/repo', 'login': 'octocat', 'pr_number': None}),
+    ('IBM_issues', {'host': 'api.github.com', 'repo': 'octo/repo', 'contributors.login': 'octocat'}),
+    ('IBM_pull_requests', {'host': 'api.github.com', 'repo': 'octo/repo', 'contributors': 'octocat'}),
+    ('IBM_reviews', {'host': 'api.github.com', 'repo': 'octo/repo', 'pr_number': 1, 'login': 'octocat'}),
+]
+
+def create_index(name, keys, options):
+
+    try:
+        db[name].create_index(keys, **options)
+        return 'unique' if options.get('unique') else 'ok'
+
+    except OperationFailure as e:
+        # Existing duplicates -- keep the lookup fast without the constraint
+        if options.get('unique') and e.code == 11000:
+            fallback = {option: value for option, value in options.items() if option != 'unique'}
+            db[name].create_index(keys, **fallback)
+            return 'non-unique (duplicates found)'
+        raise
+
+def create_indexes():
+
+    report = {}
+    drop_legacy_indexes()
+
+    for indexes in (APP_INDEXES, STORAGE_INDEXES):
+        for name, collection_indexes in indexes.items():
+            for keys, options in collection_indexes:
+                report[f"{name} {[key for key, _ in keys]}"] = create_index(name, keys, options)
+
+    storage_state['indexed'] = True
+
+    return report
+
+def find_plan_stages(plan):
+
+    # Walk classic and slot-based explain output for stage names
+    stages = []
+
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            stages.append(plan['stage'])
+        for value in plan.values():
+            stages += find_plan_stages(value)
+
+    elif isinstance(plan, list):
+        for value in plan:
+            stages += find_plan_stages(value)
+
+    return stages
+
+def check_query_plans():
+
+    report = []
+
+    for name, query in QUERY_SHAPES:
+        explain = db[name].find(query).explain()
+        stages = find_plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {}))
+
+        report.append({
+            'collection': name,
+            'query': query,
+            'collscan': 'COLLSCAN' in stages,
+            'stages': stages
+        })
+
+    return report
+
+@app.cli.command('create-indexes')
+@click.option('--explain', is_flag=True, help='Also explain every query shape and report collection scans.')
+def create_indexes_command(explain):
+    """Create and verify the indexes used by the app."""
+
+    for index, status in create_indexes().items():
+        print(f"{index} -> {status}")
+
+    if explain:
+        for plan in check_query_plans():
+            print(f"{'COLLSCAN' if plan['collscan'] else 'ok      '} {plan['collection']} {plan['query']} {plan['stages']}")
+
+
+# SCHEDULED REFRESH ------------------------------>
+# Walks IBM_repositories on a timer -- stalest / busiest repos first, bounded per host, honouring X-Poll-Interval
+
+REFRESH_INTERVAL = int(os.getenv('REFRESH_INTERVAL', 0))      # seconds between runs, 0 keeps the scheduler off
+REFRESH_LEASE = int(os.getenv('REFRESH_LEASE', 3600))         # a lease older than this is treated as dead
+REFRESH_WORKERS = {
+    False: int(os.getenv('REFRESH_WORKERS', 2)),
+    True: int(os.getenv('REFRESH_ENTERPRISE_WORKERS', 2)),
+}
+
+refresh_collection = db['IBM_refresh_runs']
+REFRESH_LOCK_ID = 'refresh_lock'
+refresh_state = {'started': False}
+
+def is_refresh_due(repo, now):
+
+    if not repo.get('last_update'):
+        return True
+
+    return repo['last_update'] + timedelta(seconds=repo.get('poll_interval') or DEFAULT_POLL_INTERVAL) <= now
+
+def get_refresh_priority(repo, now):
+
+    # Seconds since the last sync, scaled up for repos that had events on their last pass
+    if not repo.get('last_update'):
+        return float('inf')
+
+    return (now - repo['last_update']).total_seconds() * (1 + repo.get('recent_events', 0))
+
+def refresh_repo(repo, enterprise, start_date):
+
+    with app.test_request_context():
+        set_github_host(enterprise)
+
+        try:
+            result = update_repo_details(repo['repo_name'], enterprise, repo.get('contributors', []), repo.get('snapshot'), start_date, repo.get('last_update'))
+        except Exception as e:
+            print(f"Refresh failed for {repo['repo_name']}: {e}")
+            result = None
+
+    return {True: 'updated', False: 'up_to_date', None: 'failed'}[result]
+
+def refresh_host(enterprise, repos, start_date):
+
+    if not repos:
+        return []
+
+    with ThreadPoolExecutor(max_workers=REFRESH_WORKERS[enterprise]) as pool:
+        return list(pool.map(lambda repo: refresh_repo(repo, enterprise, start_date), repos))
+
+def claim_refresh_lease(run_id, now):
+
+    # Atomic single-flight across app workers -- a held lease leaves the filter unmatched and the upsert hits the fixed _id
+    try:
+        refresh_collection.find_one_and_update(
+            {'_id': REFRESH_LOCK_ID, 'leased_until': {'$lte': now}},
+            {'$set': {'run_id': run_id, 'leased_until': now + timedelta(seconds=REFRESH_LEASE)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+
+    return True
+
+def release_refresh_lease(run_id):
+
+    refresh_collection.update_one({'_id': REFRESH_LOCK_ID, 'run_id': run_id}, {'$set': {'leased_until': datetime.today()}})
+
+def run_refresh():
+
+    now = datetime.today()
+    run_id = uuid.uuid4().hex
+
+    # One run at a time across app workers
+    if not claim_refresh_lease(run_id, now):
+        print("Refresh already running")
+        return None
+
+    refresh_collection.insert_one({'_id': run_id, 'status': 'running', 'started_at': now})
+
+    try:
+        repos = list(db['IBM_repositories'].find({}, {
+            'repo_name': 1, 'host': 1, 'contributors': 1, 'snapshot': 1, 'last_update': 1, 'poll_interval': 1, 'recent_events': 1
+        }))
+        due = sorted((repo for repo in repos if is_refresh_due(repo, now)), key=lambda repo: get_refresh_priority(repo, now), reverse=True)
+
+        groups = {False: [], True: []}
+        for repo in due:
+            groups[repo.get('host') == get_host("https://api.github.ibm.com")].append(repo)
+
+        # Both hosts at once, each capped by its own worker count
+        start_date = get_start_date()
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            results = dict(zip(groups, pool.map(lambda enterprise: refresh_host(enterprise, groups[enterprise], start_date), groups)))
+
+        hosts = {}
+        for enterprise, statuses in results.items():
+            hosts['enterprise' if enterprise else 'public'] = {
+                'due': len(groups[enterprise]),
+                **{status: statuses.count(status) for status in ('updated', 'up_to_date', 'failed')}
+            }
+
+        stats = {
+            'tracked': len(repos),
+            'due': len(due),
+            **{status: sum(counts[status] for counts in hosts.values()) for status in ('updated', 'up_to_date', 'failed')}
+        }
+
+        refresh_collection.update_one({'_id': run_id}, {'$set': {
+            'status': 'done',
+            'stats': stats,
+            'hosts': hosts,
+            'finished_at': datetime.today(),
+            'duration': (datetime.today() - now).total_seconds()
+        }})
+
+    except Exception as e:
+        print(f"Refresh run failed: {e}")
+        refresh_collection.update_one({'_id': run_id}, {'$set': {'status': 'failed', 'error': str(e), 'finished_at': datetime.today()}})
+
+    finally:
+        release_refresh_lease(run_id)
+
+    return run_id
+
+def refresh_scheduler():
+
+    while True:
+        run_refresh()
+        sleep(REFRESH_INTERVAL)
+
+@app.before_request
+def start_refresh_scheduler():
+
+    # Serving processes only -- CLI commands import the app without starting the timer
+    if REFRESH_INTERVAL <= 0 or refresh_state['started']:
+        return
+
+    refresh_state['started'] = True
+    Thread(target=refresh_scheduler, daemon=True).start()
+
+@app.cli.command('refresh-repos')
+def refresh_repos_command():
+    """Run one incremental refresh pass over the tracked repositories."""
+
+    run_id = run_refresh()
+    if run_id:
+        run = refresh_collection.find_one({'_id': run_id})
+        print(f"{run['status']} {run.get('stats', run.get('error'))}")
+
+
+# <--------------------### V.IMP The Global Base Functions --------------------->
+def get_repo_metadata(full_repo):
+
+    parent_url = f"{session['BASE_URL']}/repos/{full_repo}"
+
+    parent_response = github_get(parent_url, headers=session['HEADERS'])
+    parent_repo = parent_response.json()
+
+    return {
+        "id": parent_repo["id"],
+        "name": parent_repo["name"],
+        "full_name": parent_repo["full_name"],
+        "description": parent_repo["description"],
+        "url": parent_repo["html_url"],
+        "created_at": parent_repo["created_at"],
+        "updated_at": parent_repo["updated_at"],
+        "language": parent_repo["language"],
+        "owner": {
+            "login": parent_repo["owner"]["login"],
+            "avatar_url": parent_repo["owner"]["avatar_url"],
+            "url": parent_repo["owner"]["html_url"]
+        },
+        "stars": parent_repo["stargazers_count"],
+        "watchers_count": parent_repo["watchers_count"],
+        "forks_count": parent_repo["forks_count"],
+        "open_issues_count": parent_repo["open_issues_count"],
+        "default_branch": parent_repo["default_branch"],
+        "visibility": parent_repo["visibility"],
+        "topics": get_repo_topics(parent_repo["full_name"]),
+    }
+
+def get_repo_snapshot(full_repo, repo_name):
+
+    event_url = f"{session['BASE_URL']}/repos/{full_repo}/events?per_page=100"
+    response = github_get(event_url, headers=session['HEADERS'])
+
+    # Set Dummy Snapshot -- if No Previous Activity in 90 days / No Valid Event Found
+    snapshot = '-1'
+    
+    if response.status_code == 200:
+        data = response.json()
+
+        for event in data:
+            if (event['type'] in github_events) and (repo_name in event['repo']['name']):
+                snapshot = event['id']
+                break
+
+    else:
+        print(f"Failed to fetch events for {full_repo}")
+
+    return snapshot
+
+# Extraction checkpoints -------------->
+# Phase progress of a per-user extraction; rows are written as pages complete, so a restart resumes instead of starting over
+
+EXTRACTION_CHECKPOINT_TTL = timedelta(hours=int(os.getenv('EXTRACTION_CHECKPOINT_TTL_HOURS', 24)))
+
+checkpoint_collection = db['IBM_extraction_checkpoints']
+
+def get_checkpoint_id(login, host, full_repo):
+    return f"{host}:{login}:{full_repo}"
+
+def load_checkpoint(login, host, full_repo):
+
+    checkpoint = checkpoint_collection.find_one({'_id': get_checkpoint_id(login, host, full_repo)})
+
+    # Too old to resume -- the window has moved on
+    if checkpoint and checkpoint['updated_at'] < datetime.today() - EXTRACTION_CHECKPOINT_TTL:
+        return None
+
+    return checkpoint
+
+def save_checkpoint(checkpoint):
+    checkpoint['updated_at'] = datetime.today()
+    checkpoint_collection.replace_one({'_id': checkpoint['_id']}, checkpoint, upsert=True)
+
+def load_stored_commit_branches(login, host, full_repo):
+
+    # Global commits written before a restart -- later branches extend these instead of replacing them
+    query = {'host': host, 'repo': full_repo, 'login': login, 'pr_number': None}
+    return {doc['sha']: doc['commit'].get('branches', []) for doc in db['IBM_commits'].find(query, {'sha': 1, 'commit.branches': 1})}
+
+def extract_all_details(user_info, full_repo, start_date, job_id=None):
+
+    host = get_host()
+    login = user_info['login']
+    checkpoint = load_checkpoint(login, host, full_repo)
+
+    if checkpoint:
+        # Same window as the interrupted run, so saved page numbers still line up
+        print(f"Resuming {full_repo} -> {login} at {checkpoint['phase']}")
+        start_date = checkpoint['start_date']
+
+    else:
+        checkpoint = {
+            '_id': get_checkpoint_id(login, host, full_repo),
+            'login': login,
+            'host': host,
+            'repo': full_repo,
+            'start_date': start_date,
+            'end_date': datetime.utcnow(),
+            'shard_days': EXTRACTION_SHARD_DAYS,        # 0 -- sequential scans, page checkpoints below
+            'phase': 'commits',
+            'commits': {},                              # branch -> pages done, or True  |  shard -> True
+            'issues': {},                               # creator / assignee -> pages done, or True  |  shard -> True
+            'pull_requests': {'page': 0, 'done': []},   # pages done, PR numbers handled
+            'pull_request_shards': {},                  # shard -> True
+            'counts': {'commits': 0, 'issues': 0, 'pull_requests': 0}
+        }
+
+        # Initialize the user - repo object and drop previous rows; partial rows accumulate from here
+        set_user_repo_entry(login, host, full_repo, {'status': 'extracting'}, user_info)
+        write_storage_ops(build_clear_ops(login, host, full_repo))
+        save_checkpoint(checkpoint)
+
+    counts = checkpoint['counts']
+    key = {'host': host, 'repo': full_repo}
+
+    def flush():
+        # Runs after each batch is written -- a crash before it only repeats idempotent upserts
+        save_checkpoint(checkpoint)
+        update_job(job_id, counts=counts)
+
+    def build_commit_ops(batch):
+        ops = build_record_ops(login, host, full_repo, commits=[details for _, _, _, details in batch if details])
+        ops['IBM_commits'] += [build_commit_branch_op(key, login, sha, branch) for _, sha, branch, details in batch if not details]
+        return ops
+
+
+    repo_details = get_repo_metadata(full_repo)
+
+    # Window shards fetched concurrently -- boundaries come from the checkpoint so a restart lines up
+    shards = get_window_shards(start_date, checkpoint['end_date'], checkpoint['shard_days']) if checkpoint.get('shard_days') else None
+
+    # Fetchers are generators -- rows reach Mongo in bounded batches while the scan runs
+    if checkpoint['phase'] == 'commits':
+        update_job(job_id, phase='commits', progress=10)
+        commit_branches = load_stored_commit_branches(login, host, full_repo)
+
+        def flush_commits(written):
+            counts['commits'] = len(commit_branches)
+            flush()
+
+        if shards:
+            commits = iter_sharded_commits(repo_details['full_name'], login, shards, repo_details['default_branch'],
+                                           progress=checkpoint['commits'], commit_branches=commit_branches)
+        else:
+            commits = iter_global_commits(repo_details['full_name'], start_date, {login}, repo_details['default_branch'], author=login,
+                                          progress=checkpoint['commits'], commit_branches=commit_branches)
+        stream_to_storage(commits, build_commit_ops, flush_commits)
+        checkpoint['phase'] = 'issues'
+        save_checkpoint(checkpoint)
+
+    if checkpoint['phase'] == 'issues':
+        update_job(job_id, phase='issues', progress=40, counts=counts)
+        stored_issues = counts['issues']
+
+        def flush_issues(written):
+            counts['issues'] = stored_issues + written
+            flush()
+
+        if shards:
+            issues = iter_sharded_issues(repo_details['full_name'], login, shards, progress=checkpoint['issues'])
+        else:
+            issues = iter_user_issues(repo_details['full_name'], login, start_date, progress=checkpoint['issues'])
+        stream_to_storage(issues, lambda batch: build_record_ops(login, host, full_repo, issues=batch), flush_issues)
+        checkpoint['phase'] = 'pull_requests'
+        save_checkpoint(checkpoint)
+
+    if checkpoint['phase'] == 'pull_requests':
+        update_job(job_id, phase='pull_requests', progress=55, counts=counts)
+        stored_prs = counts['pull_requests']
+
+        def flush_prs(written):
+            counts['pull_requests'] = stored_prs + written
+            flush()
+
+        # PR entries carry their commits and comments -- flushed in smaller batches
+        # The GraphQL harvester already pages the whole window cheaply
+        if shards and PR_HARVESTER != 'graphql':
+            pull_requests = iter_sharded_prs(repo_details['full_name'], login, shards, progress=checkpoint['pull_request_shards'])
+        else:
+            pull_requests = iter_pr_entries(repo_details['full_name'], login, start_date, progress=checkpoint['pull_requests'])
+        stream_to_storage(pull_requests, lambda batch: build_record_ops(login, host, full_repo, pull_requests=batch), flush_prs,
+                          batch_size=max(STREAM_BATCH_SIZE // 10, 1))
+        checkpoint['phase'] = 'snapshot'
+        save_checkpoint(checkpoint)
+
+    update_job(job_id, phase='snapshot', progress=95, counts=counts)
+
+
+
+
+    # Set the Snapshot -- For update tracking
+    repo_details['snapshot'] = get_repo_snapshot(full_repo, repo_details['name'])
+
+
+
+    # Repo metadata and the user entry (also adds the user as contributor) -- the rows are already stored
+    write_storage_ops(build_storage_ops(user_info, host, full_repo, repo_details, replace=False))
+    checkpoint_collection.delete_one({'_id': checkpoint['_id']})
+
+    print(f"Successfully Extracted {full_repo} -> {login}")
+
+    return repo_details
+
+def get_repo_logins(full_repo):
+
+    # Tracked contributors + users mapped to this repo on the current host
+    repo_collection = db['IBM_repositories']
+    mappings_collection = db['IBM_user_mappings']
+
+    if session.get('enterprise'):
+        login_field, repos_field = 'enterprise', 'enterprise_repos'
+    else:
+        login_field, repos_field = 'public', 'public_repos'
+
+    logins = set()
+
+    result = repo_collection.find_one({'host': get_host(), 'repo_name': full_repo}, {'contributors': 1})
+    if result:
+        logins.update(result.get('contributors', []))
+
+    for mapping in mappings_collection.find({repos_field: full_repo}, {login_field: 1}):
+        if mapping.get(login_field):
+            logins.add(mapping[login_field])
+
+    return sorted(logins)
+
+def extract_repo_details(full_repo, start_date, job_id=None):
+
+    # Repo-centric ingestion -- fetch the window once and fan it out to every contributor
+    data_collection = db['IBM_github_data']
+    host = get_host()
+
+    logins = get_repo_logins(full_repo)
+    if not logins:
+        print(f"No contributors tracked for {full_repo}")
+        return {}
+
+    repo_details = get_repo_metadata(full_repo)
+
+    update_job(job_id, phase='commits', progress=10, counts={'contributors': len(logins)})
+    commits = scan_global_commits(repo_details['full_name'], start_date, set(logins), repo_details['default_branch'])
+
+    update_job(job_id, phase='issues', progress=40)
+    issues = scan_repo_issues(repo_details['full_name'], start_date, logins)
+
+    update_job(job_id, phase='pull_requests', progress=55)
+
+    # PR nodes are consumed as the pages arrive -- only each contributor's entries are kept
+    prs_by_login = None
+    if PR_HARVESTER == 'graphql':
+        prs_by_login = {login: [] for login in logins}
+        try:
+            for pr in harvest_prs_graphql(repo_details['full_name'], start_date):
+                for login in logins:
+                    pr_entry = build_graphql_pr_entry(repo_details['full_name'], pr, login)
+                    if pr_entry:
+                        prs_by_login[login].append(pr_entry)
+
+        except requests.HTTPError as e:
+            print(f"{e} -- using the REST scan")
+            prs_by_login = None
+
+    # REST fallback -- one listing pass for every contributor, split by membership
+    if prs_by_login is None:
+        prs_by_login = scan_repo_prs(repo_details['full_name'], start_date, logins)
+
+    update_job(job_id, phase='snapshot', progress=90)
+    snapshot = get_repo_snapshot(full_repo, repo_details['name'])
+
+    # Reuse stored profiles, only look up users that have no document yet
+    user_infos = {doc['user_info']['login']: doc['user_info']
+                  for doc in data_collection.find({'user_info.login': {'$in': logins}}, {'user_info': 1})}
+
+    operations = {}
+    all_details = {}
+
+    for login in logins:
+        user_info = user_infos.get(login) or get_user_info(login)
+        if not user_info:
             continue
 
+        login_details = dict(repo_details)
+        login_details['commits'] = commits.get(login, [])
+        login_details['issues'] = issues.get(login, [])
+        login_details['pull_requests'] = prs_by_login.get(login, [])
+        login_details['snapshot'] = snapshot
+
+        all_details[login] = login_details
+        merge_storage_ops(operations, build_storage_ops(user_info, host, full_repo, login_details))
+
+    # Write every contributor in one pass
+    if operations:
+        write_storage_ops(operations)
+
+    print(f"Successfully Extracted {full_repo} -> {len(all_details)} contributors")
+
+    return all_details
+
+
+# EXTRACTION JOBS ------------------------------>
+# Extractions run on a bounded worker pool; status lives in Mongo so any app worker can answer polls
+
+EXTRACTION_WORKERS = int(os.getenv('EXTRACTION_WORKERS', 2))
+JOB_LEASE = int(os.getenv('JOB_LEASE', 600))        # seconds without a heartbeat before a queued / running job is dead
+
+job_collection = db['IBM_extraction_jobs']
+job_pool = ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS)
+active_jobs = {}            # job key -> job_id, for single-flight within this process
+active_jobs_lock = Lock()
+job_state = {'indexed': False, 'heartbeat': False}
+
+def get_job_key(enterprise, login, full_repo):
+    return f"{'enterprise' if enterprise else 'public'}:{login}:{full_repo}"
+
+def update_job(job_id, **fields):
+
+    if not job_id:
+        return
+
+    fields['updated_at'] = datetime.today()
+    job_collection.update_one({'_id': job_id}, {'$set': fields})
+
+def finish_job(job_id, **fields):
+
+    # Releases the job key for the next claim
+    fields['updated_at'] = fields['finished_at'] = datetime.today()
+    job_collection.update_one({'_id': job_id}, {'$set': fields, '$unset': {'active': ''}})
+
+def expire_stale_jobs(query):
 
-        
+    # Jobs whose worker stopped heart-beating (restart, timeout kill) are failed so their key can be claimed again
+    cutoff = datetime.today() - timedelta(seconds=JOB_LEASE)
+    stale = {**query, 'status': {'$in': ['queued', 'running']}, 'updated_at': {'$lt': cutoff}}
 
-        repo_details['commits'] += new_updates[username]['commits']
-        repo_details['pull_requests'] += new_updates[username]['new_prs']
-        repo_details['issues'] += new_updates[username]['new_issues']
+    job_collection.update_many(stale, {
+        '$set': {'status': 'failed', 'error': 'Worker lost -- no heartbeat', 'finished_at': datetime.today()},
+        '$unset': {'active': ''}
+    })
 
+def job_heartbeat():
 
-        del new_updates[username]['commits']
-        del new_updates[username]['new_prs']
-        del new_updates[username]['new_issues']
+    # Keeps every job this process owns (queued or running) inside its lease
+    while True:
+        sleep(JOB_LEASE / 3)
 
+        with active_jobs_lock:
+            job_ids = list(active_jobs.values())
 
-        # Update issues
-        for idx,issue in enumerate(repo_details['issues']):
-            issue_no = issue['number']
+        if job_ids:
+            try:
+                job_collection.update_many({'_id': {'$in': job_ids}}, {'$set': {'updated_at': datetime.today()}})
+            except PyMongoError as e:
+                print(f"Job heartbeat failed: {e}")
 
-            if issue_no in new_updates[username]:
-                repo_details['issues'][idx] = new_updates[username][issue_no]
-                del new_updates[username][issue_no]
-        
-        # Update PRs
-        for idx,pr in enumerate(repo_details['pull_requests']):
+def claim_job(key, fields):
 
-            if pr['pr_number'] in new_updates[username]:
-                
-                pr_changes = new_updates[username][pr['pr_number']]
+    # Atomic single-flight across app workers -- one active job per key, enforced by a partial unique index
+    if not job_state['indexed']:
+        create_index('IBM_extraction_jobs', [('key', ASCENDING)], {'unique': True, 'partialFilterExpression': {'active': True}})
+        job_state['indexed'] = True
 
+    expire_stale_jobs({'key': key})
 
-                # If new detail changes
-                if pr_changes['pr_details']:
-                    repo_details['pull_requests'][idx]['pr_details'] = pr_changes['pr_details']
-                
-                if pr_changes['commits']:
-                    repo_details['pull_requests'][idx]['commits'] = pr_changes['commits']
-                
-                if pr_changes['comments']:
-                    repo_details['pull_requests'][idx]['comments'] += pr_changes['comments']
-            
-                del new_updates[username][pr['pr_number']]
+    job_id = uuid.uuid4().hex
+    try:
+        job = job_collection.find_one_and_update(
+            {'key': key, 'active': True},
+            {'$setOnInsert': {
+                '_id': job_id,
+                **fields,
+                'status': 'queued',
+                'phase': None,
+                'progress': 0,
+                'created_at': datetime.today(),
+                'updated_at': datetime.today()
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Another worker claimed the key first
+        job = job_collection.find_one({'key': key, 'active': True})
 
-        # If anything remains, it is a new pull request with comments --> So append it directly
-        for pr_no in new_updates[username]:
-            new_updates[username][pr_no]['pr_number'] = pr_no
-            repo_details['pull_requests'].append(new_updates[username][pr_no].copy())
+    return job['_id'], job['_id'] == job_id
 
+def submit_job(key, fields, func, *args, pool=None):
 
-    # DB Update -------->    
-        
-        # Update the github data for each user
-        data_collection.update_one(
-            {'user_info.login':username},
-            {'$set': {full_repo : repo_details}}
-            )
+    enterprise = session.get('enterprise', False)
 
-    # Set Latest Snapshot for Repos
-    repo_collection.update_one(
-        {'repo_name':full_repo},
-        {'$set' : {'snapshot':latest_snapshot_id, 'last_update':datetime.today()}})
+    with active_jobs_lock:
 
-    return True
+        # Attach to a running job for the same key
+        if key in active_jobs:
+            return active_jobs[key]
 
-def handle_issue_event(event, username):
+        job_id, claimed = claim_job(key, {**fields, 'enterprise': enterprise})
+        if not claimed:
+            return job_id
 
-    issue = event['payload']['issue']        
+        active_jobs[key] = job_id
 
-    issue_data = {
-        'url': issue['html_url'],
-        'title': issue['title'],
-        'number': issue['number'],
-        'created_at': issue['created_at'],
-        'updated_at': issue['updated_at'],
-        'labels': issue['labels'],
-        'state': issue['state'],
-        'type': 'created' if issue['user']['login'] == username else 'assigned'
-    }
+        if not job_state['heartbeat']:
+            job_state['heartbeat'] = True
+            Thread(target=job_heartbeat, daemon=True).start()
 
-    if event['payload']['action'] == 'opened':
-        return True, (issue['number'], issue_data)
-    else:
-        return False, (issue['number'], issue_data)
-    
-def handle_pull_request_event(event, full_repo, username, HEADERS):
+    values = get_session_host()
+    (pool or job_pool).submit(run_job, job_id, key, values, func, args)
 
-    data = event['payload']['pull_request']
-    pr_details = {
-            "title": data["title"],
-            "number": data["number"],
-            "state": data["state"],
-            "merged": data["merged"],
-            "url": data["html_url"],
-            "date": data['created_at'],
-            "requested_reviewers": [reviewer["login"] for reviewer in data["requested_reviewers"]],
-            "assigned_by": data['assignee']['login'] if data.get('assignee') else None,
-            "assigned_to": [user['login'] for user in data.get('assignees', [])],
-            "labels": [label["name"] for label in data["labels"]],
-            "comments": data["comments"],
-            "review_comments": data["review_comments"],
-            "commits": data["commits"],
-            "additions": data["additions"],
-            "deletions": data["deletions"],
-            "changed_files": data["changed_files"]
-        }
+    return job_id
 
-    if event['payload']['action'] == 'opened':
-        # New pr object
-        new_pr = {'pr_number': data['number'],
-                  'pr_details': None,
-                  'commits': [],
-                  'comments': []
-                }
+def run_job(job_id, key, values, func, args):
 
-        new_pr['pr_details'] = pr_details
+    with app.test_request_context():
+        session.update(values)
 
-        # Fetch Commits
-        commits_url = data['commits_url']
-        response = requests.get(commits_url, headers=HEADERS)
+        try:
+            update_job(job_id, status='running', started_at=datetime.today())
+            func(*args, job_id=job_id)
+            finish_job(job_id, status='done', phase=None, progress=100)
 
-        if response.status_code == 200:
-            fetched_commits = response.json()
-        else:
-            fetched_commits = []
-        
-        
-        # Filter commits by username
-        filtered = [commit['sha'] for commit in fetched_commits if commit['author'] and commit['author']['login'] == username]
-        commit_details = []
+        except Exception as e:
+            print(f"Job failed for {key}: {e}")
+            finish_job(job_id, status='failed', error=str(e))
 
-        for sha in filtered:
-            details = get_commit_details_from_SHA(full_repo,sha)
+        finally:
+            with active_jobs_lock:
+                active_jobs.pop(key, None)
 
-            if details:
-                commit_details.append(details)
+def submit_extraction_job(user_info, full_repo, start_date):
 
-        new_pr['commits'] = commit_details
+    key = get_job_key(session.get('enterprise', False), user_info['login'], full_repo)
+    fields = {'user': user_info['login'], 'repo': full_repo}
 
-        return True, new_pr
-        
-    else:
-        # Return the current PR directly
-        return False, (pr_details['number'], pr_details)
+    return submit_job(key, fields, extract_all_details, user_info, full_repo, start_date)
 
-def handle_pull_request_review_event(event,username,HEADERS):
-    
-    comments_data = []
-    review = event['payload']['review']
-    
-    # Review Approved  |OR|  # If event has body -- then it was a single comment and no comments exist further
-    if review['state'] == 'approved' or review['body']:
-        data = {
-            'state': review['state'],
-            'url': review['html_url'],
-            'comment': review['body'] if review['body'] else None,
-            'date': review['submitted_at'],
-        }
-        comments_data.append(data)
+def submit_repo_ingestion_job(full_repo, start_date):
 
-    elif review['state'] in ('changes_requested', 'commented'):
+    key = get_job_key(session.get('enterprise', False), '*', full_repo)
+    fields = {'user': None, 'repo': full_repo, 'mode': 'repo'}
 
-        # Fetch all the comments
-        comment_url = review['pull_request_url'] + f"/reviews/{review['id']}/comments"
-        response = requests.get(comment_url, headers=HEADERS)
+    return submit_job(key, fields, extract_repo_details, full_repo, start_date)
 
-        if response.status_code == 200:
-            fetched_comments = response.json()
-        else:
-            fetched_comments = []
 
+# BULK EXTRACTION ------------------------------>
+# One request extracts every mapped repo of a user on both hosts; each host gets its own worker budget
 
-        for comment in fetched_comments:
-            if comment['user']['login'] == username:
-                data = {
-                        'state': review['state'],
-                        'url': comment['html_url'],
-                        'comment': comment.get('body'),
-                        'date': comment['updated_at'],
-                        'file': comment.get('path')
-                    }
-                comments_data.append(data)
-    
-    return event['payload']['pull_request']['number'],comments_data
+BULK_WORKERS = {
+    False: int(os.getenv('BULK_WORKERS', 2)),
+    True: int(os.getenv('BULK_ENTERPRISE_WORKERS', 2)),
+}
 
-def handle_push_event(event, full_repo, BASE_URL, HEADERS):
+bulk_collection = db['IBM_bulk_extractions']
+bulk_pools = {enterprise: ThreadPoolExecutor(max_workers=workers) for enterprise, workers in BULK_WORKERS.items()}
 
-    commit =  event['payload']['commits'][-1]
-    commit_sha = commit['sha']
+def get_mapped_repos(mapping):
 
-    pull_url = f"{BASE_URL}/repos/{full_repo}/commits/{commit_sha}/pulls"
-    response = requests.get(pull_url, headers=HEADERS)
-    
-    if response.status_code == 200:
-        pulls = response.json()
-        # If there are associated pull requests, This is valid pr_commit
+    # (enterprise, host login, repos) for each host the user is mapped on
+    hosts = ((False, 'public', 'public_repos'), (True, 'enterprise', 'enterprise_repos'))
 
-        if pulls:
-            pr_no = pulls[0]['number']
-            commit_url = f"{BASE_URL}/repos/{full_repo}/pulls/{pr_no}/commits"
-            response = requests.get(commit_url, headers=HEADERS)
+    return [(enterprise, mapping[login_field], mapping.get(repos_field) or [])
+            for enterprise, login_field, repos_field in hosts if mapping.get(login_field)]
 
-            if response.status_code == 200:
-                return pr_no,response.json()
-            else:
-                print(f"Error fetching All commits: {response.status_code} - {response.text}")
+def get_current_repos(login, host, repos):
 
+    # Repos whose finished extraction still matches the latest repo event
+    user_data = db['IBM_github_data'].find_one({'user_info.login': login}, {'repos': 1}) or {}
+    stored = {entry['repo']: entry.get('snapshot') for entry in user_data.get('repos', [])
+              if entry.get('host') == host and entry.get('status') == 'done' and entry.get('repo') in repos}
 
-        else:
-            print(f"Error fetching pull requests: {response.status_code} - {response.text}")
-    
-    return None,[]
+    known = list(stored)
+    snapshots = run_parallel(lambda full_repo: get_repo_snapshot(full_repo, full_repo.split('/')[-1]), known)
 
+    return {full_repo for full_repo, snapshot in zip(known, snapshots) if snapshot and snapshot == stored[full_repo]}
 
+def submit_host_extractions(bulk_id, enterprise, host_login, repos, start_date):
 
+    # Own request context per host -- the caller's session keeps its host selection
+    with app.test_request_context():
+        set_github_host(enterprise)
+        host = get_host()
 
-# <--------------------### V.IMP The Global Base Functions --------------------->
-def extract_all_details(user_info, full_repo, start_date):
+        user_info = resolve_identity(host_login)
+        if not user_info:
+            return [{'host': host, 'repo': full_repo, 'job_id': None, 'status': 'failed', 'error': f"User not found -> {host_login}"} for full_repo in repos]
 
-    data_collection = db['IBM_github_data']
-    repo_collection = db['IBM_repositories']
+        current = get_current_repos(user_info['login'], host, repos)
+        entries = []
 
-    # Initialize the user - repo object
-    data_collection.update_one(
-        {'user_info.login':user_info.get('login')},
-        {'$set' : {'user_info':user_info, full_repo:False}},
-        upsert=True
-    )
+        for full_repo in repos:
+            if full_repo in current:
+                entries.append({'host': host, 'repo': full_repo, 'job_id': None, 'status': 'current'})
+                continue
 
+            key = get_job_key(enterprise, user_info['login'], full_repo)
+            fields = {'user': user_info['login'], 'repo': full_repo, 'bulk_id': bulk_id}
+            job_id = submit_job(key, fields, extract_all_details, user_info, full_repo, start_date, pool=bulk_pools[enterprise])
 
-    parent_url = f"{session['BASE_URL']}/repos/{full_repo}"
+            entries.append({'host': host, 'repo': full_repo, 'job_id': job_id, 'status': 'queued'})
 
-    parent_response = requests.get(parent_url, headers=session['HEADERS'])
-    parent_repo = parent_response.json()
+    return entries
 
+def submit_bulk_extraction(mapping):
 
-    repo_details = {
-        "id": parent_repo["id"],
-        "name": parent_repo["name"],
-        "full_name": parent_repo["full_name"],
-        "description": parent_repo["description"],
-        "url": parent_repo["html_url"],
-        "created_at": parent_repo["created_at"],
-        "updated_at": parent_repo["updated_at"],
-        "language": parent_repo["language"],
-        "owner": {
-            "login": parent_repo["owner"]["login"],
-            "avatar_url": parent_repo["owner"]["avatar_url"],
-            "url": parent_repo["owner"]["html_url"]
-        },
-        "stars": parent_repo["stargazers_count"],
-        "watchers_count": parent_repo["watchers_count"],
-        "forks_count": parent_repo["forks_count"],
-        "open_issues_count": parent_repo["open_issues_count"],
-        "default_branch": parent_repo["default_branch"],
-        "visibility": parent_repo["visibility"],
-        "topics": get_repo_topics(parent_repo["full_name"]),
-    }
+    bulk_id = uuid.uuid4().hex
+    start_date = get_start_date()
+    entries = []
 
-    repo_details['commits'] = get_user_global_commits(parent_repo['full_name'], user_info['login'], start_date)
-    repo_details['issues'] = get_user_issues(repo_details['full_name'], user_info['login'], start_date)
-    repo_details['pull_requests'] = get_pr_details_commits_comments(repo_details['full_name'], user_info['login'], start_date)
+    for enterprise, host_login, repos in get_mapped_repos(mapping):
+        entries += submit_host_extractions(bulk_id, enterprise, host_login, repos, start_date)
 
+    bulk_collection.insert_one({
+        '_id': bulk_id,
+        'login': mapping['login'],
+        'repos': entries,
+        'created_at': datetime.today()
+    })
 
+    return bulk_id
 
+def get_bulk_report(bulk_id):
 
-    # Set the Snapshot -- For update tracking
-    event_url = f"{session['BASE_URL']}/repos/{full_repo}/events?per_page=100"
-    response = requests.get(event_url, headers=session['HEADERS'])
+    bulk = bulk_collection.find_one({'_id': bulk_id})
+    if not bulk:
+        return None
 
-    # Set Dummy Snapshot -- if No Previous Activity in 90 days / No Valid Event Found
-    repo_details['snapshot'] = '-1'
-    
-    if response.status_code == 200:
-        data = response.json()
+    job_ids = [entry['job_id'] for entry in bulk['repos'] if entry.get('job_id')]
+    expire_stale_jobs({'_id': {'$in': job_ids}})
+    jobs = {job['_id']: job for job in job_collection.find({'_id': {'$in': job_ids}}, {'status': 1, 'phase': 1, 'progress': 1, 'error': 1})}
 
-        for event in data:
-            if (event['type'] in github_events) and (repo_details['name'] in event['repo']['name']):
-                latest_event_id = event['id']
-                repo_details['snapshot'] = latest_event_id
-                break
+    repos = []
+    counts = {}
+    for entry in bulk['repos']:
+        job = jobs.get(entry.get('job_id'), {})
+        status = job.get('status', entry['status'])
+        progress = 100 if status in ('current', 'done', 'failed') else job.get('progress', 0)
 
-    else:
-        print(f"Failed to fetch events for {user_info['login']}")
+        repos.append({**entry, 'status': status, 'phase': job.get('phase'), 'progress': progress, 'error': job.get('error', entry.get('error'))})
+        counts[status] = counts.get(status, 0) + 1
 
+    return {
+        'bulk_id': bulk['_id'],
+        'login': bulk['login'],
+        'created_at': bulk['created_at'],
+        'finished': not any(status in counts for status in ('queued', 'running')),
+        'progress': round(sum(repo['progress'] for repo in repos) / len(repos)) if repos else 100,
+        'counts': counts,
+        'repos': repos
+    }
 
+@app.cli.command('bulk-extract')
+@click.argument('login')
+@click.option('--wait', is_flag=True, help='Poll until every repo has finished.')
+def bulk_extract_command(login, wait):
+    """Extract every mapped repo of LOGIN on both hosts."""
 
-    # Upsert the user info and repo details into the database
-    data_collection.update_one(
-        {"user_info.login": user_info.get('login')},  
-        {"$set": {"user_info": user_info, full_repo: repo_details}},
-        upsert=True
-    )
+    mapping = db['IBM_user_mappings'].find_one({'login': login})
+    if not mapping:
+        print(f"No user mapping for {login}")
+        return
 
-    # Add user as contributor
-    repo_collection.update_one(
-        {"repo_name": full_repo},
-        {"$addToSet": {"contributors": user_info['login']}}
-    )
+    bulk_id = submit_bulk_extraction(mapping)
 
-    print(f"Successfully Extracted {full_repo} -> {user_info['login']}")
+    report = get_bulk_report(bulk_id)
+    print(f"{bulk_id} {report['counts']}")
 
-    return repo_details
+    while wait and not report['finished']:
+        sleep(10)
+        report = get_bulk_report(bulk_id)
+        print(f"{report['progress']}% {report['counts']}")
 
 
     
@@ -1023,17 +3432,14 @@ def favicon():
 
 @app.route('/<user>', methods=['GET', 'POST'])
 def get_user(user):
-    login_name = get_login_name(user)
-    
-    if login_name:
-        user_info = get_user_info(login_name)
-        
-        if user_info:
-            return jsonify(user_info)
-        else:
-            return jsonify({"error": f"Something Went Wrong -- fetching User Data -> {login_name}"}), 500 
-    else:
+    user_info = resolve_identity(user)
+
+    if user_info is None:
         return jsonify({"error": f"Invalid username or email: {user}"}), 400
+    elif user_info:
+        return jsonify(user_info)
+    else:
+        return jsonify({"error": f"Something Went Wrong -- fetching User Data -> {user}"}), 500
 
 
 
@@ -1081,16 +3487,15 @@ def get_contributions(user):
 def get_user_repos(user):
 
     # Check for Public / Enterprise --> Set Session BASE_URL and HEADERS
-    if request.args.get('enterprise') == 'true':
-        session['enterprise'] = True
-        session['BASE_URL'] = "https://api.github.ibm.com"
-        session['HEADERS'] = set_headers(os.getenv('GITHUB_ENTERPRISE'))
-    else:
-        session['enterprise'] = False
-        session['BASE_URL'] = "https://api.github.com"
-        session['HEADERS'] = set_headers(os.getenv('GITHUB_TOKEN'))
+    set_github_host(request.args.get('enterprise') == 'true')
+
+    user_info = resolve_identity(user)
+
+    if user_info is None:
+        return jsonify({"error": f"Invalid username or email: {user}"}), 400
+    elif not user_info:
+        return jsonify({"error": f"Something Went Wrong -- fetching User Data -> {user}"}), 500
 
-    user_info = get_user_info(get_login_name(user))
     username = user_info['login']
 
     user_repos = get_user_repositories(username)
@@ -1108,12 +3513,158 @@ def get_user_repos(user):
 
 
 # Webhook Auto Updates --------------------------------------->
-@app.route('/github/webhook', methods=['GET','POST'])
+# Deliveries are verified and acknowledged at once; workers drain them per repo so a burst becomes one merge
+
+GITHUB_WEBHOOK_SECRET = os.getenv('GITHUB_WEBHOOK_SECRET')
+GITHUB_ENTERPRISE_WEBHOOK_SECRET = os.getenv('GITHUB_ENTERPRISE_WEBHOOK_SECRET', GITHUB_WEBHOOK_SECRET)
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 2))
+WEBHOOK_COALESCE_SECONDS = float(os.getenv('WEBHOOK_COALESCE_SECONDS', 2))
+
+webhook_event_types = {
+    'issues': 'IssuesEvent',
+    'pull_request': 'PullRequestEvent',
+    'pull_request_review': 'PullRequestReviewEvent',
+    'push': 'PushEvent'
+}
+
+webhook_queue = Queue()
+pending_webhooks = {}       # (enterprise, repo) -> deliveries waiting for a worker
+active_webhooks = set()     # (enterprise, repo) currently being merged
+webhook_lock = Lock()
+webhook_state = {'started': False}
+
+def verify_webhook_signature(body, signature, enterprise):
+
+    secret = GITHUB_ENTERPRISE_WEBHOOK_SECRET if enterprise else GITHUB_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+
+    expected = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def build_webhook_event(event_name, delivery_id, payload):
+
+    # Reshape a delivery into the Events API form apply_event understands
+    payload = dict(payload)
+    if event_name == 'push':
+        payload['commits'] = [{**commit, 'sha': commit['id']} for commit in payload['commits']]
+
+    return {
+        'id': delivery_id,
+        'type': webhook_event_types[event_name],
+        'actor': {'login': payload['sender']['login']},
+        'repo': {'name': payload['repository']['full_name']},
+        'payload': payload,
+        'created_at': datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    }
+
+def is_webhook_event_wanted(event_name, payload):
+
+    if event_name not in webhook_event_types:
+        return False
+
+    # Branch deletes carry no commits; edited / dismissed reviews would re-add comments
+    if event_name == 'push':
+        return bool(payload.get('commits'))
+    if event_name == 'pull_request_review':
+        return payload.get('action') == 'submitted'
+
+    return True
+
+def queue_webhook_event(enterprise, event):
+
+    key = (enterprise, event['repo']['name'])
+
+    with webhook_lock:
+        # Only the first delivery of a burst schedules the repo; the rest ride along
+        idle = key not in pending_webhooks and key not in active_webhooks
+        pending_webhooks.setdefault(key, []).append(event)
+
+        if not webhook_state['started']:
+            webhook_state['started'] = True
+            for _ in range(WEBHOOK_WORKERS):
+                Thread(target=webhook_worker, daemon=True).start()
+
+    if idle:
+        webhook_queue.put(key)
+
+def webhook_worker():
+
+    while True:
+        key = webhook_queue.get()
+
+        # Let the rest of the burst land before draining
+        sleep(WEBHOOK_COALESCE_SECONDS)
+
+        with webhook_lock:
+            events = pending_webhooks.pop(key, [])
+            active_webhooks.add(key)
+
+        try:
+            if events:
+                apply_webhook_events(*key, events)
+
+        except Exception as e:
+            print(f"Webhook update failed for {key[1]}: {e}")
+
+        finally:
+            with webhook_lock:
+                active_webhooks.discard(key)
+                requeue = key in pending_webhooks
+
+            # Deliveries that arrived mid-merge get their own pass
+            if requeue:
+                webhook_queue.put(key)
+
+def apply_webhook_events(enterprise, full_repo, events):
+
+    with app.test_request_context():
+        set_github_host(enterprise)
+
+        repo_collection = db['IBM_repositories']
+        result = repo_collection.find_one({'host': get_host(), 'repo_name': full_repo}, {'contributors': 1})
+
+        if not result:
+            print(f"Untracked Repo -- {full_repo}")
+            return
+
+        print(f"Webhook Update --> {full_repo} ({len(events)} deliveries)")
+
+        # Newest first, the same order update_repo_details walks the events feed
+        new_updates = {}
+        touched = new_event_batch()
+        for event in reversed(events):
+            apply_event(event, full_repo, session['BASE_URL'], session['HEADERS'], new_updates, touched)
+
+        resolve_event_batch(full_repo, session['BASE_URL'], session['HEADERS'], new_updates, touched)
+
+        save_repo_updates(full_repo, get_host(), result.get('contributors', []), new_updates)
+
+        # The events-feed checkpoint (snapshot / last_update) stays with update_repo_details -- the feed can hold
+        # events the hook never delivered, and replaying the delivered ones there is an idempotent upsert
+        repo_collection.update_one({'host': get_host(), 'repo_name': full_repo}, {'$set': {'webhook_delivery': events[-1]['id']}})
+
+@app.route('/github/webhook', methods=['POST'])
 def handle_webhook():
 
-    payload = request.get_json()
+    # GitHub Enterprise deliveries name their host
+    enterprise = bool(request.headers.get('X-GitHub-Enterprise-Host'))
 
-    return jsonify(payload)
+    if not verify_webhook_signature(request.get_data(), request.headers.get('X-Hub-Signature-256'), enterprise):
+        return jsonify({"error": "Invalid signature"}), 401
+
+    event_name = request.headers.get('X-GitHub-Event')
+    payload = request.get_json(silent=True) or {}
+
+    if event_name == 'ping':
+        return jsonify({'status': 'pong'}), 200
+
+    if not is_webhook_event_wanted(event_name, payload):
+        return jsonify({'status': 'ignored'}), 202
+
+    queue_webhook_event(enterprise, build_webhook_event(event_name, request.headers.get('X-GitHub-Delivery'), payload))
+
+    return jsonify({'status': 'queued'}), 202
 
 
 
@@ -1130,14 +3681,7 @@ def get_repo_data_from_db(user, owner, repo):
 
 
     # Check for Public / Enterprise --> Set Session BASE_URL and HEADERS
-    if request.args.get('enterprise') == 'true':
-        session['enterprise'] = True
-        session['BASE_URL'] = "https://api.github.ibm.com"
-        session['HEADERS'] = set_headers(os.getenv('GITHUB_ENTERPRISE'))
-    else:
-        session['enterprise'] = False
-        session['BASE_URL'] = "https://api.github.com"
-        session['HEADERS'] = set_headers(os.getenv('GITHUB_TOKEN'))
+    set_github_host(request.args.get('enterprise') == 'true')
 
 
 
@@ -1151,20 +3695,26 @@ def get_repo_data_from_db(user, owner, repo):
     invalid_repo = False
 
     start_date = get_start_date()  
-    user_info = get_user_info(get_login_name(user))
+    user_info = resolve_identity(user)
+
+    if user_info is None:
+        return jsonify({"error": f"User data not found for {user}"}), 404
+    elif not user_info:
+        return jsonify({"error": f"Something Went Wrong -- fetching User Data -> {user}"}), 500
+
     username = user_info['login']
     actual_name = user_info['name']
     
 
     # Check if the user exists in the database
-    db_user_data = data_collection.find_one({"user_info.login": username})  
+    db_user_data = data_collection.find_one({"user_info.login": username}, {'user_info': 1})  
     if not db_user_data:
         print("No User")
         invalid_user = True  
         
 
-    # Check if the repo exists in the user's object
-    db_repo_details = db_user_data.get(full_repo) if db_user_data else None
+    # Check if the repo exists for the user (extraction finished)
+    db_repo_details = load_repo_details(username, get_host(), full_repo) if db_user_data else None
     if not db_repo_details:
         print("No Repo") 
         invalid_repo = True  
@@ -1173,10 +3723,6 @@ def get_repo_data_from_db(user, owner, repo):
     # User or repo does not exist, upsert user info and repo details
     if invalid_user or invalid_repo:
 
-        if not user_info:
-            return jsonify({"error": f"User data not found for {user}"}), 404
-
-
         if session['enterprise']:
             result = mappings_collection.find_one({"enterprise": user})
             user_repos = result.get('enterprise_repos', [])
@@ -1192,9 +3738,16 @@ def get_repo_data_from_db(user, owner, repo):
             return jsonify({"error": f"{full_repo} Repository does not exist for user {user}."}), 404
         
 
-        extract_all_details(user_info, full_repo, start_date)
+        job_id = submit_extraction_job(user_info, full_repo, start_date)
+        job = {'job_id': job_id, 'status_url': url_for('get_job_status', job_id=job_id)}
+
+        # Rows stream in while the job runs -- serve what is stored so far on request
+        if request.args.get('partial') == 'true':
+            partial_details = load_repo_details(username, get_host(), full_repo, partial=True) if db_user_data else None
+            if partial_details:
+                return jsonify({**partial_details, **job, 'status': 'extracting'}), 202
 
-        return jsonify({}), 200          
+        return jsonify(job), 202
 
 
     # If both user and repo exist, update DB and Return Data
@@ -1203,6 +3756,61 @@ def get_repo_data_from_db(user, owner, repo):
         return jsonify(db_repo_details), 200
 
 
+# Repo-level ingestion for every tracked contributor
+@app.route('/repos/<owner>/<repo>/ingest', methods=['GET', 'POST'])
+def ingest_repo(owner, repo):
+
+    full_repo = f"{owner}/{repo}"
+
+    # Check for Public / Enterprise --> Set Session BASE_URL and HEADERS
+    set_github_host(request.args.get('enterprise') == 'true')
+
+    if not get_repo_logins(full_repo):
+        return jsonify({"error": f"No tracked contributors for {full_repo}"}), 404
+
+    job_id = submit_repo_ingestion_job(full_repo, get_start_date())
+
+    return jsonify({'job_id': job_id, 'status_url': url_for('get_job_status', job_id=job_id)}), 202
+
+
+# Extraction Job Status ------------>
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+
+    expire_stale_jobs({'_id': job_id})
+    job = job_collection.find_one({'_id': job_id})
+
+    if not job:
+        return jsonify({"error": f"Job not found -> {job_id}"}), 404
+
+    job['job_id'] = job.pop('_id')
+    return jsonify(job), 200
+
+@app.route('/<user>/bulk_extract', methods=['POST'])
+def bulk_extract(user):
+
+    mapping = db['IBM_user_mappings'].find_one({'login': user})
+    if not mapping:
+        return jsonify({"error": f"No user mapping for {user}"}), 404
+
+    bulk_id = submit_bulk_extraction(mapping)
+
+    return jsonify({
+        **get_bulk_report(bulk_id),
+        "status_url": url_for('get_bulk_status', bulk_id=bulk_id)
+    }), 202
+
+@app.route('/bulk/<bulk_id>', methods=['GET'])
+def get_bulk_status(bulk_id):
+
+    report = get_bulk_report(bulk_id)
+
+    if not report:
+        return jsonify({"error": f"Bulk extraction not found -> {bulk_id}"}), 404
+
+    return jsonify(report), 200
+
+
 if __name__ == '__main__':
     app.run()
 